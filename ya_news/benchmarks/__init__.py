@@ -0,0 +1,13 @@
+"""
+Замеры производительности проекта YaNews.
+
+Модули запускаются из каталога ya_news, например:
+
+    python -m benchmarks.bad_words
+"""
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanews.settings')
+django.setup()
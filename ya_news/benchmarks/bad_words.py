@@ -0,0 +1,69 @@
+"""Сравнение перебора запрещённых слов со скомпилированным шаблоном."""
+import argparse
+import random
+import timeit
+
+from django.test import override_settings
+
+from benchmarks.utils import print_table, write_results
+from news.moderation import find_bad_word
+
+ALPHABET = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+
+
+def random_words(count, rng):
+    return {
+        ''.join(rng.choices(ALPHABET, k=rng.randint(5, 12)))
+        for _ in range(count)
+    }
+
+
+def loop_check(text, words):
+    """Прежний алгоритм CommentForm.clean_text."""
+    lowered_text = text.lower()
+    for word in words:
+        if word in lowered_text:
+            return word
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--words', type=int, nargs='+',
+                        default=[10, 1000, 5000])
+    parser.add_argument('--length', type=int, default=20000,
+                        help='длина комментария в символах')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help='путь к файлу результатов')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    vocabulary = list(random_words(5000, rng))
+    results = []
+    for count in args.words:
+        bad_words = list(random_words(count, rng) - set(vocabulary))
+        text = ''
+        while len(text) < args.length:
+            text += rng.choice(vocabulary) + ' '
+        with override_settings(BAD_WORDS=bad_words):
+            # Прогрев: шаблон компилируется при первом вызове.
+            assert bool(find_bad_word(text)) == bool(
+                loop_check(text, bad_words)
+            )
+            loop = timeit.timeit(
+                lambda: loop_check(text, bad_words), number=args.repeat
+            )
+            compiled = timeit.timeit(
+                lambda: find_bad_word(text), number=args.repeat
+            )
+        results.append({
+            'words': count,
+            'loop_ms': round(loop / args.repeat * 1000, 3),
+            'compiled_ms': round(compiled / args.repeat * 1000, 3),
+        })
+    print_table(results, ('words', 'loop_ms', 'compiled_ms'))
+    print('Результаты:', write_results('bad_words', results, args.output))
+
+
+if __name__ == '__main__':
+    main()
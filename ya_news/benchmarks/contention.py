@@ -0,0 +1,131 @@
+"""
+Конкурентная запись в SQLite из нескольких процессов.
+
+Каждый процесс, как воркер gunicorn, в цикле выполняет «запрос»:
+в транзакции читает новость и добавляет к ней комментарий. Сравниваются
+настройки SQLite по умолчанию и профиль из settings.SQLITE_OPTIONS.
+
+    python -m benchmarks.contention --processes 1 4 8 --duration 5
+"""
+import argparse
+import multiprocessing
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.signals import request_finished, request_started
+from django.db import OperationalError, connections, transaction
+from django.db.backends.signals import connection_created
+
+from benchmarks.utils import percentile, print_table, write_results
+from news.models import Comment, News
+
+PROFILES = {
+    # Как было: журнал отката, BEGIN DEFERRED, соединение на запрос.
+    'default': {'OPTIONS': {}, 'CONN_MAX_AGE': 0},
+    'tuned': {
+        'OPTIONS': settings.DATABASES['default']['OPTIONS'],
+        'CONN_MAX_AGE': settings.DATABASES['default']['CONN_MAX_AGE'],
+    },
+}
+
+
+def configure(path, profile):
+    connection = connections['default']
+    connection.close()
+    connection.settings_dict.update(NAME=str(path), **PROFILES[profile])
+
+
+def create_database(path):
+    """База с применёнными миграциями, одной новостью и автором."""
+    configure(path, 'default')
+    call_command('migrate', verbosity=0)
+    News.objects.create(title='Новость', text='Текст новости')
+    get_user_model().objects.create(username='author')
+    connections.close_all()
+
+
+def worker(path, profile, deadline):
+    configure(path, profile)
+    opened = []
+    connection_created.connect(
+        lambda **kwargs: opened.append(1), weak=False
+    )
+    news_id = News.objects.values_list('pk', flat=True).get()
+    author_id = get_user_model().objects.values_list('pk', flat=True).get()
+    timings = []
+    errors = 0
+    while time.perf_counter() < deadline:
+        # Сигналы запроса закрывают соединение, если CONN_MAX_AGE истёк.
+        request_started.send(sender=None)
+        start = time.perf_counter()
+        try:
+            with transaction.atomic():
+                news = News.objects.get(pk=news_id)
+                Comment.objects.create(
+                    news=news, author_id=author_id, text='Комментарий'
+                )
+        except OperationalError:
+            errors += 1
+        else:
+            timings.append(time.perf_counter() - start)
+        finally:
+            request_finished.send(sender=None)
+    return timings, errors, len(opened)
+
+
+def run(template, profile, processes, duration):
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / 'db.sqlite3'
+        shutil.copy(template, path)
+        deadline = time.perf_counter() + duration
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(processes, mp_context=context) as pool:
+            results = list(pool.map(
+                worker, [path] * processes, [profile] * processes,
+                [deadline] * processes
+            ))
+    timings = sum((result[0] for result in results), [])
+    return {
+        'profile': profile,
+        'processes': processes,
+        'writes': len(timings),
+        'errors': sum(result[1] for result in results),
+        'connections': sum(result[2] for result in results),
+        'wps': round(len(timings) / duration, 1),
+        'p50_ms': round(percentile(timings, 50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 95) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--processes', type=int, nargs='+',
+                        default=[1, 4, 8])
+    parser.add_argument('--duration', type=float, default=5,
+                        help='длительность замера в секундах')
+    parser.add_argument('--output', help='путь к файлу результатов')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        template = Path(directory) / 'template.sqlite3'
+        create_database(template)
+        for processes in args.processes:
+            for profile in PROFILES:
+                results.append(
+                    run(template, profile, processes, args.duration)
+                )
+
+    print_table(results, ('profile', 'processes', 'writes', 'errors',
+                          'connections', 'wps', 'p50_ms', 'p95_ms'))
+    print('Результаты:', write_results('contention', results, args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+"""
+Нагрузочный прогон сценариев пользователей прямо через WSGI-приложение.
+
+Пул потоков изображает одновременных пользователей: каждый поток
+выполняет свой сценарий по кругу, пока не истечёт --duration, и хранит
+cookie между запросами, как браузер. Для каждого шага сценария
+считаются пропускная способность, перцентили задержки и доля ошибок —
+ответов с неожиданным статусом или исключений.
+
+    python -m benchmarks.loadgen --workers 8 --duration 10
+    python -m benchmarks.loadgen --scenarios commenter --workers 4
+"""
+import argparse
+import random
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client
+from django.urls import reverse
+
+from benchmarks.utils import (
+    percentile, print_table, temporary_database, write_results
+)
+from news.models import News
+
+
+class VirtualUser:
+    """Пользователь со своими cookie, который ходит в WSGI-приложение."""
+
+    def __init__(self, application, cookies=None):
+        self.application = application
+        self.cookies = SimpleCookie()
+        for name, morsel in (cookies or {}).items():
+            self.cookies[name] = morsel.value
+        self.records = []
+
+    def get(self, step, path, expect=200):
+        return self.request(step, 'GET', path, expect=expect)
+
+    def post(self, step, path, data, expect=302):
+        return self.request(step, 'POST', path, data, expect)
+
+    def request(self, step, method, path, data=None, expect=200):
+        """Выполняет запрос и записывает шаг: (шаг, ошибка, секунды)."""
+        start = time.perf_counter()
+        try:
+            status = self.call(method, path, data)
+        except Exception:
+            status = None
+        self.records.append(
+            (step, status != expect, time.perf_counter() - start)
+        )
+        return status
+
+    def call(self, method, path, data):
+        path, _, query = path.partition('?')
+        body = urlencode(data or {}).encode()
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'HTTP_COOKIE': '; '.join(
+                f'{name}={morsel.value}'
+                for name, morsel in self.cookies.items()
+            ),
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': BytesIO(body),
+        }
+        if settings.CSRF_COOKIE_NAME in self.cookies:
+            environ['HTTP_X_CSRFTOKEN'] = (
+                self.cookies[settings.CSRF_COOKIE_NAME].value
+            )
+        setup_testing_defaults(environ)
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split()[0])
+            response['headers'] = headers
+
+        result = self.application(environ, start_response)
+        try:
+            b''.join(result)
+        finally:
+            result.close()
+        for name, value in response['headers']:
+            if name.lower() == 'set-cookie':
+                self.store_cookie(value)
+        return response['status']
+
+    def store_cookie(self, header):
+        cookie = SimpleCookie(header)
+        for name, morsel in cookie.items():
+            # Так сервер удаляет cookie, например сессию при выходе.
+            if morsel['max-age'] == '0':
+                self.cookies.pop(name, None)
+            else:
+                self.cookies[name] = morsel.value
+
+
+def anonymous(user, news_ids, rng):
+    """Анонимный читатель: главная, новость, комментарии, поиск."""
+    pk = rng.choice(news_ids)
+    user.get('home', reverse('news:home'))
+    user.get('detail', reverse('news:detail', args=(pk,)))
+    user.get('comments', reverse('news:comments', args=(pk,)))
+    user.get('search', reverse('news:search') + '?' + urlencode(
+        {'q': 'новост'}
+    ))
+
+
+def commenter(user, news_ids, rng):
+    """Авторизованный читатель оставляет комментарий к новости."""
+    url = reverse('news:detail', args=(rng.choice(news_ids),))
+    # Страница с формой заодно выдаёт cookie csrftoken.
+    user.get('detail (auth)', url)
+    user.post('comment', url, {'text': 'Комментарий под нагрузкой'})
+    user.get('detail (auth)', url)
+
+
+# Сценарий и нужна ли для него авторизация.
+SCENARIOS = {
+    'anonymous': (anonymous, False),
+    'commenter': (commenter, True),
+}
+
+
+def seed(news):
+    News.objects.bulk_create(
+        News(title=f'Новость {i}', text=f'Текст новости {i}')
+        for i in range(news)
+    )
+    return list(News.objects.values_list('pk', flat=True))
+
+
+def login(number):
+    """Cookie сессии нового пользователя."""
+    user = get_user_model().objects.create(username=f'load-{number}')
+    client = Client()
+    client.force_login(user)
+    return client.cookies
+
+
+def run(application, scenarios, workers, duration, news_ids):
+    users = []
+    for number in range(workers):
+        name = scenarios[number % len(scenarios)]
+        scenario, authenticated = SCENARIOS[name]
+        cookies = login(number) if authenticated else None
+        users.append((scenario, VirtualUser(application, cookies)))
+    deadline = time.perf_counter() + duration
+
+    def worker(number):
+        scenario, user = users[number]
+        rng = random.Random(number)
+        while time.perf_counter() < deadline:
+            scenario(user, news_ids, rng)
+        return user.records
+
+    with ThreadPoolExecutor(workers) as pool:
+        return sum(pool.map(worker, range(workers)), [])
+
+
+def summarize(records, duration):
+    """Строка отчёта на каждый шаг сценариев и итоговая строка."""
+    steps = defaultdict(list)
+    for step, error, seconds in records:
+        steps[step].append((error, seconds))
+    steps['total'] = [value for values in steps.values() for value in values]
+    results = []
+    for step, values in steps.items():
+        errors = sum(error for error, _ in values)
+        timings = [seconds for _, seconds in values]
+        if len(timings) == 1:
+            # Для перцентилей statistics нужно хотя бы два значения.
+            timings *= 2
+        results.append({
+            'step': step,
+            'requests': len(values),
+            'errors': errors,
+            'error_rate': round(errors / len(values) * 100, 2),
+            'rps': round(len(values) / duration, 1),
+            'p50_ms': round(percentile(timings, 50) * 1000, 3),
+            'p95_ms': round(percentile(timings, 95) * 1000, 3),
+            'p99_ms': round(percentile(timings, 99) * 1000, 3),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS,
+                        default=list(SCENARIOS))
+    parser.add_argument('--workers', type=int, default=8,
+                        help='число одновременных пользователей')
+    parser.add_argument('--duration', type=float, default=10,
+                        help='длительность прогона в секундах')
+    parser.add_argument('--news', type=int, default=100)
+    parser.add_argument('--output', help='путь к файлу результатов')
+    args = parser.parse_args()
+
+    from yanews.wsgi import application
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Потоки пишут одновременно, поэтому база в файле, а не в памяти.
+        with temporary_database(str(Path(directory) / 'db.sqlite3')):
+            news_ids = seed(args.news)
+            records = run(application, args.scenarios, args.workers,
+                          args.duration, news_ids)
+    results = summarize(records, args.duration)
+
+    print_table(results, ('step', 'requests', 'errors', 'error_rate', 'rps',
+                          'p50_ms', 'p95_ms', 'p99_ms'))
+    print('Результаты:', write_results('loadgen', results, args.output))
+
+
+if __name__ == '__main__':
+    main()
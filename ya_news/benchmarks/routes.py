@@ -0,0 +1,159 @@
+"""
+Число запросов, задержка и память для каждого маршрута news.urls
+при разном количестве новостей и комментариев.
+
+Сначала растёт число новостей при одном комментарии, затем число
+комментариев к одной новости при наибольшем числе новостей.
+
+    python -m benchmarks.routes --news 10 1000 10000 --sizes 10 1000 100000
+"""
+import argparse
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client
+from django.urls import reverse
+
+from benchmarks.utils import (
+    measure, print_table, temporary_database, write_results
+)
+from news import urls
+from news.cache import HOME, bump_generations, news_key
+from news.models import (
+    Comment, News, NewsMonthCount, make_excerpt, month_of
+)
+from news.pagination import encode_cursor
+
+User = get_user_model()
+
+BATCH_SIZE = 5000
+
+
+def seed_news(count):
+    """
+    Доводит число новостей до count, по одной на день назад от
+    сегодняшнего, чтобы архив заполнял разные месяцы.
+    """
+    existing = News.objects.count()
+    today = date.today()
+    for start in range(existing, count, BATCH_SIZE):
+        News.objects.bulk_create(
+            News(
+                title=f'Новость {i}',
+                text=f'Текст новости {i}',
+                excerpt=make_excerpt(f'Текст новости {i}'),
+                date=today - timedelta(days=i),
+            )
+            for i in range(start, min(start + BATCH_SIZE, count))
+        )
+    # bulk_create не отправляет сигналов, счётчики архива и поколение
+    # кеша обновляются явно.
+    NewsMonthCount.objects.refresh({
+        month_of(today - timedelta(days=i)) for i in range(count)
+    })
+    bump_generations(HOME)
+
+
+def seed(news, author, size):
+    """Доводит число комментариев к новости до size."""
+    missing = size - Comment.objects.filter(news=news).count()
+    for start in range(0, missing, BATCH_SIZE):
+        Comment.objects.bulk_create(
+            Comment(news=news, author=author, text=f'Комментарий {i}')
+            for i in range(start, min(start + BATCH_SIZE, missing))
+        )
+    bump_generations(HOME, news_key(news.pk))
+
+
+def deep_cursor(news):
+    """Курсор из глубины ветки: страница должна стоить как первая."""
+    comments = Comment.objects.filter(news=news).order_by('created', 'pk')
+    return encode_cursor(comments[comments.count() * 9 // 10])
+
+
+def build_routes(news, comment):
+    """Для каждого маршрута — клиент, метод и адрес."""
+    return {
+        'news:home': ('anonymous', reverse('news:home')),
+        'news:detail': ('anonymous', reverse('news:detail', args=(news.pk,))),
+        'news:comments': (
+            'anonymous',
+            reverse('news:comments', args=(news.pk,))
+            + f'?after={deep_cursor(news)}'
+        ),
+        'news:search': ('anonymous', reverse('news:search') + '?q=новости'),
+        'news:archive': ('anonymous', reverse('news:archive')),
+        'news:archive_year': (
+            'anonymous', reverse('news:archive_year', args=(news.date.year,))
+        ),
+        'news:archive_month': ('anonymous', reverse(
+            'news:archive_month', args=(news.date.year, news.date.month)
+        )),
+        'news:feed_atom': ('anonymous', reverse('news:feed_atom')),
+        'news:feed_json': ('anonymous', reverse('news:feed_json')),
+        'news:edit': ('author', reverse('news:edit', args=(comment.pk,))),
+        'news:delete': ('author', reverse('news:delete', args=(comment.pk,))),
+    }
+
+
+def measure_routes(parser, clients, news, comment, args, before, sizes):
+    """Замеры всех маршрутов, словарь sizes добавляется в каждую строку."""
+    routes = build_routes(news, comment)
+    missing = {
+        f'{urls.app_name}:{pattern.name}' for pattern in urls.urlpatterns
+    } - routes.keys()
+    if missing:
+        parser.error(f'Нет сценария для маршрутов: {missing}')
+    return [
+        {'route': name, **sizes, **measure(
+            lambda: clients[client].get(url), args.repeat, before
+        )}
+        for name, (client, url) in routes.items()
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--news', type=int, nargs='+',
+                        default=[10, 1000, 10000], help='число новостей')
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10, 1000, 100000],
+                        help='число комментариев к новости')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--warm-cache', action='store_true',
+                        help='не очищать кеш страниц перед запросами')
+    parser.add_argument('--output', help='путь к файлу результатов')
+    args = parser.parse_args()
+
+    before = None if args.warm_cache else cache.clear
+    results = []
+    with temporary_database():
+        author = User.objects.create(username='author')
+        clients = {'anonymous': Client(), 'author': Client()}
+        clients['author'].force_login(author)
+        seed_news(min(args.news))
+        # Самая новая новость: она есть и на главной, и в лентах.
+        news = News.objects.order_by('-date', '-pk').first()
+        comment = Comment.objects.create(
+            news=news, author=author, text='Комментарий автора'
+        )
+        for count in sorted(args.news):
+            seed_news(count)
+            results += measure_routes(
+                parser, clients, news, comment, args, before,
+                {'news': count, 'comments': 1}
+            )
+        for size in sorted(args.sizes):
+            seed(news, author, size)
+            results += measure_routes(
+                parser, clients, news, comment, args, before,
+                {'news': max(args.news), 'comments': size}
+            )
+    print_table(results, ('route', 'news', 'comments', 'status', 'queries',
+                          'p50_ms', 'p95_ms', 'peak_kib'))
+    print('Результаты:', write_results('routes', results, args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Поиск по новостям: индекс FTS5 против icontains.
+
+Для каждого слова замеряется то, что нужно странице результатов:
+число найденных новостей и первая страница.
+
+    python -m benchmarks.search --rows 1000000
+"""
+import argparse
+import random
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from benchmarks.utils import (
+    percentile, print_table, temporary_database, write_results
+)
+from news.models import News
+from news.search import search_news
+
+ALPHABET = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+BATCH_SIZE = 10000
+
+
+def seed(rows, vocabulary, rng):
+    """Тексты из случайных слов; частота слова убывает по Ципфу."""
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    with transaction.atomic():
+        for start in range(0, rows, BATCH_SIZE):
+            News.objects.bulk_create(
+                News(
+                    title=' '.join(rng.choices(vocabulary, weights, k=4)),
+                    text=' '.join(rng.choices(vocabulary, weights, k=40)),
+                )
+                for _ in range(min(BATCH_SIZE, rows - start))
+            )
+
+
+def first_page(queryset):
+    return queryset.count(), list(
+        queryset[:settings.NEWS_SEARCH_RESULTS_ON_PAGE]
+    )
+
+
+def icontains(word):
+    return News.objects.filter(
+        Q(title__icontains=word) | Q(text__icontains=word)
+    )
+
+
+def timed(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--vocabulary', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='путь к файлу результатов')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    vocabulary = list({
+        ''.join(rng.choices(ALPHABET, k=rng.randint(4, 10)))
+        for _ in range(args.vocabulary)
+    })
+    # Частое, среднее и редкое слово.
+    words = {
+        'частое': vocabulary[0],
+        'среднее': vocabulary[len(vocabulary) // 100],
+        'редкое': vocabulary[-1],
+    }
+    results = []
+    with temporary_database():
+        seed(args.rows, vocabulary, rng)
+        for frequency, word in words.items():
+            row = {'word': frequency}
+            for method, queryset in (
+                ('icontains', icontains(word)),
+                ('fts5', search_news(word)),
+            ):
+                (count, _), timings = timed(
+                    lambda: first_page(queryset.all()), args.repeat
+                )
+                row[f'{method}_found'] = count
+                row[f'{method}_p50_ms'] = round(percentile(timings, 50), 3)
+            results.append(row)
+
+    print_table(results, (
+        'word', 'icontains_found', 'icontains_p50_ms',
+        'fts5_found', 'fts5_p50_ms',
+    ))
+    print('Результаты:', write_results('search', results, args.output))
+
+
+if __name__ == '__main__':
+    main()
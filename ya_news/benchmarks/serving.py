@@ -0,0 +1,164 @@
+"""
+Пропускная способность страниц новостей под WSGI и под ASGI.
+
+Каждый режим запускается в отдельном процессе: под WSGI работают
+синхронные представления и пул потоков, под ASGI — асинхронные
+представления и цикл событий с тем же числом одновременных запросов.
+
+    python -m benchmarks.serving --concurrency 1 8 32 --duration 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client
+from django.urls import reverse
+
+from benchmarks.utils import (
+    percentile, print_table, temporary_database, write_results
+)
+from news.models import Comment, News
+
+# Режим и значение YANEWS_ASYNC_VIEWS для дочернего процесса.
+MODES = {'wsgi': '0', 'asgi': '1'}
+
+
+def scenarios(cookie):
+    """Адреса и cookie: анонимные и авторизованные просмотры."""
+    news = News.objects.first()
+    session = f'{settings.SESSION_COOKIE_NAME}={cookie}'
+    urls = (reverse('news:home'), reverse('news:detail', args=(news.pk,)))
+    return [(url, '') for url in urls] + [(url, session) for url in urls]
+
+
+def seed(comments):
+    author = get_user_model().objects.create(username='author')
+    news = News.objects.create(title='Новость', text='Текст новости')
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=f'Комментарий {i}')
+        for i in range(comments)
+    )
+    client = Client()
+    client.force_login(author)
+    return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+
+def run_wsgi(requests, concurrency, deadline):
+    from yanews.wsgi import application
+
+    def worker(offset):
+        timings = []
+        while time.perf_counter() < deadline:
+            path, cookie = requests[(offset + len(timings)) % len(requests)]
+            environ = {'PATH_INFO': path, 'HTTP_COOKIE': cookie}
+            setup_testing_defaults(environ)
+            start = time.perf_counter()
+            body = application(environ, lambda status, headers: None)
+            b''.join(body)
+            body.close()
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        return sum(pool.map(worker, range(concurrency)), [])
+
+
+def run_asgi(requests, concurrency, deadline):
+    from yanews.asgi import application
+
+    async def request(path, cookie):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'},
+            'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': b'',
+            'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+            'server': ('localhost', 80), 'client': ('127.0.0.1', 0),
+        }
+
+        messages = [{'type': 'http.request', 'body': b''}]
+
+        async def receive():
+            # После тела запроса клиент молчит до конца ответа.
+            if messages:
+                return messages.pop()
+            await asyncio.Future()
+
+        async def send(message):
+            pass
+
+        await application(scope, receive, send)
+
+    async def worker(offset):
+        timings = []
+        while time.perf_counter() < deadline:
+            path, cookie = requests[(offset + len(timings)) % len(requests)]
+            start = time.perf_counter()
+            await request(path, cookie)
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    async def main():
+        results = await asyncio.gather(*map(worker, range(concurrency)))
+        return sum(results, [])
+
+    return asyncio.run(main())
+
+
+def run_mode(mode, args):
+    """Замеры одного режима; выполняется в дочернем процессе."""
+    runner = run_asgi if mode == 'asgi' else run_wsgi
+    results = []
+    with temporary_database():
+        requests = scenarios(seed(args.comments))
+        for concurrency in args.concurrency:
+            deadline = time.perf_counter() + args.duration
+            timings = runner(requests, concurrency, deadline)
+            results.append({
+                'mode': mode,
+                'concurrency': concurrency,
+                'requests': len(timings),
+                'rps': round(len(timings) / args.duration, 1),
+                'p50_ms': round(percentile(timings, 50) * 1000, 3),
+                'p95_ms': round(percentile(timings, 95) * 1000, 3),
+            })
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--concurrency', type=int, nargs='+',
+                        default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=5,
+                        help='длительность замера в секундах')
+    parser.add_argument('--comments', type=int, default=100)
+    parser.add_argument('--output', help='путь к файлу результатов')
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode:
+        return run_mode(args.mode, args)
+
+    results = []
+    for mode, async_views in MODES.items():
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.serving', '--mode', mode,
+             *sys.argv[1:]],
+            env={**os.environ, 'YANEWS_ASYNC_VIEWS': async_views},
+            capture_output=True, text=True, check=True,
+        ).stdout
+        results += json.loads(output.splitlines()[-1])
+
+    print_table(results, ('mode', 'concurrency', 'requests', 'rps',
+                          'p50_ms', 'p95_ms'))
+    print('Результаты:', write_results('serving', results, args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Запросы к базе на авторизованный запрос при разных SESSION_MODE.
+
+    python -m benchmarks.sessions --repeat 50
+"""
+import argparse
+
+from django.contrib.auth import get_user_model
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from benchmarks.utils import (
+    measure, print_table, temporary_database, write_results
+)
+from news.models import Comment, News
+
+# Значения настроек для каждого режима, как в yanews/settings.py.
+MODES = {
+    'db': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'USER_CACHE_TIMEOUT': None,
+    },
+    'cache': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'USER_CACHE_TIMEOUT': 60,
+    },
+    'cookies': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies',
+        'USER_CACHE_TIMEOUT': 60,
+    },
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--output', help='путь к файлу результатов')
+    args = parser.parse_args()
+
+    results = []
+    with temporary_database():
+        author = get_user_model().objects.create(username='author')
+        news = News.objects.create(title='Новость', text='Текст новости')
+        comment = Comment.objects.create(
+            news=news, author=author, text='Комментарий'
+        )
+        urls = {
+            'news:home': reverse('news:home'),
+            'news:detail': reverse('news:detail', args=(news.pk,)),
+            'news:edit': reverse('news:edit', args=(comment.pk,)),
+        }
+        for mode, options in MODES.items():
+            with override_settings(**options):
+                client = Client()
+                client.force_login(author)
+                for name, url in urls.items():
+                    # Первый запрос заполняет кеш сессии и пользователя.
+                    client.get(url)
+                    result = measure(lambda: client.get(url), args.repeat)
+                    results.append({'mode': mode, 'route': name, **result})
+
+    print_table(results, ('mode', 'route', 'status', 'queries', 'p50_ms',
+                          'p95_ms'))
+    print('Результаты:', write_results('sessions', results, args.output))
+
+
+if __name__ == '__main__':
+    main()
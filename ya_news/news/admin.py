@@ -1,15 +1,53 @@
 from django.contrib import admin
+from django.db.models import Subquery
+from django.urls import reverse
+from django.utils.html import format_html
 
 from .models import Comment, News
-
-
-class CommentInline(admin.StackedInline):
-    model = Comment
-    extra = 0
+from .search import search_news
 
 
 @admin.register(News)
 class NewsAdmin(admin.ModelAdmin):
-    inlines = [
-        CommentInline,
-    ]
+    """
+    Новости без встроенных комментариев.
+
+    У популярной новости тысячи комментариев, и форма для каждого
+    делала страницу новости неподъёмной. Комментарии открываются
+    постраничным списком CommentAdmin, отфильтрованным по новости.
+    """
+    list_display = ('title', 'date', 'comment_count')
+    date_hierarchy = 'date'
+    search_fields = ('title', 'text')
+    readonly_fields = ('comment_count',)
+    # Без COUNT(*) по всей таблице на каждой странице списка.
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_comment_count()
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по полнотекстовому индексу вместо icontains."""
+        if not search_term:
+            return queryset, False
+        found = search_news(search_term).values('pk')
+        return queryset.filter(pk__in=Subquery(found)), False
+
+    @admin.display(description='Комментарии', ordering='comment_count')
+    def comment_count(self, news):
+        url = reverse('admin:news_comment_changelist')
+        return format_html(
+            '<a href="{}?news__id__exact={}">{}</a>',
+            url, news.pk, news.comment_count or 0
+        )
+
+
+@admin.register(Comment)
+class CommentAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'news', 'author', 'created')
+    list_select_related = ('news', 'author')
+    date_hierarchy = 'created'
+    search_fields = ('author__username',)
+    autocomplete_fields = ('news', 'author')
+    ordering = ('-created',)
+    show_full_result_count = False
@@ -0,0 +1,27 @@
+"""
+Маршруты news для запуска под ASGI.
+
+Совпадают с news.urls, но чтение новостей обслуживают асинхронные
+представления.
+"""
+from django.urls import path
+
+from news import async_views, urls
+
+app_name = urls.app_name
+
+ASYNC_VIEWS = {
+    'home': async_views.AsyncNewsList,
+    'detail': async_views.AsyncNewsDetailView,
+    'comments': async_views.AsyncNewsComments,
+    'feed_atom': async_views.AsyncNewsAtomFeed,
+    'feed_json': async_views.AsyncNewsJsonFeed,
+}
+
+urlpatterns = [
+    path(
+        str(pattern.pattern), ASYNC_VIEWS[pattern.name].as_view(),
+        name=pattern.name
+    ) if pattern.name in ASYNC_VIEWS else pattern
+    for pattern in urls.urlpatterns
+]
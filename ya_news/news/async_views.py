@@ -0,0 +1,164 @@
+"""
+Асинхронные представления для чтения новостей.
+
+Подключаются через news.async_urls при запуске под ASGI и работают
+с асинхронным API ORM, не занимая поток на весь запрос. Синхронные
+представления из news.views остаются для WSGI.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.views import generic
+
+from yanews.metrics import CACHE_HEADER
+from yanews.routers import areplica_synced_at, replica_reads
+
+from .cache import (
+    HOME, aget_generation, news_key, page_etag, page_key, set_etag
+)
+from .feeds import aatom_feed, ajson_feed
+from .forms import CommentForm
+from .models import News
+from .pagination import aget_comment_page
+from .views import NewsComment, latest_news
+
+
+class AsyncPageView(generic.View):
+    """
+    Асинхронная страница с кешем для анонимных пользователей.
+
+    Контекст собирается заранее, поэтому при рендере шаблона запросов
+    к базе нет. Условные запросы обрабатываются как в PageCacheMixin.
+    """
+    template_name = None
+
+    async def get_cache_generation(self):
+        raise NotImplementedError
+
+    async def get_context_data(self, **kwargs):
+        return {'view': self, **kwargs}
+
+    async def get(self, request, *args, **kwargs):
+        # Шаблоны обращаются к request.user синхронно.
+        request.user = await request.auser()
+        generation = await self.get_cache_generation()
+        etag = page_etag(generation, request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            with replica_reads(
+                request, generation, await areplica_synced_at()
+            ):
+                response = await self.get_page(request, generation, **kwargs)
+        # Рендер мог завести новый CSRF-секрет, и ETag должен
+        # соответствовать токену на странице.
+        return set_etag(response, page_etag(generation, request))
+
+    async def get_page(self, request, generation, **kwargs):
+        if request.user.is_authenticated:
+            return render(
+                request, self.template_name,
+                await self.get_context_data(**kwargs)
+            )
+        key = page_key(request.get_full_path(), generation)
+        content = await cache.aget(key)
+        if content is not None:
+            return HttpResponse(content, headers={CACHE_HEADER: 'HIT'})
+        response = render(
+            request, self.template_name, await self.get_context_data(**kwargs)
+        )
+        response[CACHE_HEADER] = 'MISS'
+        await cache.aset(key, response.content, settings.NEWS_CACHE_TIMEOUT)
+        return response
+
+
+class AsyncNewsList(AsyncPageView):
+    """Список новостей."""
+    template_name = 'news/home.html'
+
+    async def get_cache_generation(self):
+        return await aget_generation(HOME)
+
+    async def get_context_data(self, **kwargs):
+        news_list = [news async for news in latest_news()]
+        return await super().get_context_data(
+            object_list=news_list,
+            news_list=news_list,
+            cache_generation=await self.get_cache_generation(),
+            cache_timeout=settings.NEWS_CACHE_TIMEOUT,
+            **kwargs
+        )
+
+
+class AsyncNewsDetail(AsyncPageView):
+    template_name = 'news/detail.html'
+
+    async def get_cache_generation(self):
+        return await aget_generation(news_key(self.kwargs['pk']))
+
+    async def get_context_data(self, **kwargs):
+        try:
+            news = await News.objects.aget(pk=self.kwargs['pk'])
+        except News.DoesNotExist:
+            raise Http404
+        comments, next_cursor = await aget_comment_page(news.pk)
+        context = await super().get_context_data(
+            object=news,
+            news=news,
+            comments=comments,
+            next_cursor=next_cursor,
+            news_id=news.pk,
+            **kwargs
+        )
+        if self.request.user.is_authenticated:
+            context['form'] = CommentForm()
+        return context
+
+
+class AsyncNewsDetailView(generic.View):
+
+    async def get(self, request, *args, **kwargs):
+        view = AsyncNewsDetail.as_view()
+        return await view(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        view = sync_to_async(NewsComment.as_view())
+        return await view(request, *args, **kwargs)
+
+
+class AsyncNewsComments(generic.View):
+    """Следующая страница комментариев в виде HTML-фрагмента."""
+
+    async def get(self, request, pk):
+        request.user = await request.auser()
+        if not await News.objects.filter(pk=pk).aexists():
+            raise Http404
+        comments, next_cursor = await aget_comment_page(
+            pk, request.GET.get('after')
+        )
+        return render(request, 'news/comments.html', {
+            'comments': comments,
+            'next_cursor': next_cursor,
+            'news_id': pk,
+        })
+
+
+class AsyncNewsAtomFeed(generic.View):
+    """Все новости в формате Atom, отдаются асинхронным потоком."""
+
+    async def get(self, request):
+        return StreamingHttpResponse(
+            aatom_feed(request),
+            content_type='application/atom+xml; charset=utf-8',
+        )
+
+
+class AsyncNewsJsonFeed(generic.View):
+    """Страница новостей в JSON, отдаётся асинхронным потоком."""
+
+    async def get(self, request):
+        return StreamingHttpResponse(
+            ajson_feed(request), content_type='application/json'
+        )
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+
+def user_key(pk):
+    return f'auth:user:{pk}'
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    Берёт пользователя сессии из кеша, а не из базы.
+
+    Кеширование включается настройкой USER_CACHE_TIMEOUT. Запись
+    сбрасывается при сохранении и удалении пользователя, в том числе
+    при смене пароля: вместе с ним меняется хеш, по которому Django
+    проверяет сессию, и старые сессии перестают действовать.
+    """
+
+    def get_user(self, user_id):
+        timeout = settings.USER_CACHE_TIMEOUT
+        if not timeout:
+            return super().get_user(user_id)
+        key = user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, timeout)
+        return user
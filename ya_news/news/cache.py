@@ -0,0 +1,86 @@
+"""
+Поколенческие ключи кеша для страниц новостей.
+
+У главной страницы и у каждой новости есть номер поколения, который
+входит в ключи закешированных страниц. При изменении данных поколение
+сдвигается, и старые записи просто перестают запрашиваться, а не
+удаляются по одной. Номер поколения — время сдвига в наносекундах.
+Из него же получается ETag для условных GET-запросов.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+
+HOME = 'news:generation:home'
+
+# Форматы лент, для которых кешируются записи новостей, см. news.feeds.
+ATOM = 'atom'
+JSON = 'json'
+FEED_FORMATS = (ATOM, JSON)
+
+
+def news_key(pk):
+    return f'news:generation:{pk}'
+
+
+def feed_item_key(feed_format, pk):
+    """Запись новости в ленте; сбрасывается явно, без поколений."""
+    return f'news:feed:{feed_format}:{pk}'
+
+
+def get_generation(key):
+    """Возвращает текущее поколение, заводя его при отсутствии."""
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+async def aget_generation(key):
+    """Асинхронный вариант get_generation()."""
+    generation = await cache.aget(key)
+    if generation is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        generation = await cache.aget(key)
+    return generation
+
+
+def bump_generations(*keys):
+    """Сдвигает поколения, делая недействительными связанные записи."""
+    generation = time.time_ns()
+    cache.set_many(dict.fromkeys(keys, generation), timeout=None)
+
+
+def page_key(path, generation):
+    digest = hashlib.md5(path.encode()).hexdigest()
+    return f'news:page:{digest}:{generation}'
+
+
+def page_etag(generation, request):
+    """
+    Значение ETag для страницы.
+
+    Поколение меняется при любом изменении новости или комментариев
+    к ней, а пользователь — потому что страница для автора отличается
+    от страницы для анонима. В формах авторизованного пользователя есть
+    CSRF-токен, а секрет, из которого он получен, меняется при каждом
+    входе. Поэтому в ETag входит хеш секрета: иначе после повторного
+    входа браузер получил бы 304 и отправил форму со старым токеном.
+    Last-Modified не отдаётся: он точен лишь до секунды, и изменение
+    в ту же секунду, что и прежний ответ, осталось бы незамеченным.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return f'"{generation}-0"'
+    secret = request.META.get('CSRF_COOKIE', '')
+    digest = hashlib.md5(secret.encode()).hexdigest()[:16]
+    return f'"{generation}-{user.pk}-{digest}"'
+
+
+def set_etag(response, etag):
+    response.headers['ETag'] = etag
+    patch_vary_headers(response, ('Cookie',))
+    return response
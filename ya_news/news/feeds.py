@@ -0,0 +1,287 @@
+"""
+Ленты новостей для партнёров: Atom со всем архивом и JSON по страницам.
+
+Ленты отдаются потоком. Идентификаторы новостей читаются порциями
+через iterator(), сериализованные записи каждой порции берутся из кеша
+одним get_many(), а из базы загружаются только новости, которых
+в кеше нет. Так выгрузка всего архива не держит его в памяти и не
+сериализует заново неизменившиеся новости. Записи сбрасываются
+сигналом при изменении новости, см. news.signals.
+
+Функции с префиксом a — асинхронные варианты для запуска под ASGI:
+синхронный генератор Django под ASGI сначала читает целиком и лишь
+потом отправляет.
+"""
+import json
+from datetime import date, datetime, time
+from io import StringIO
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import BadRequest
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.html import escape
+from django.utils.xmlutils import SimplerXMLGenerator
+
+from .cache import ATOM, JSON, feed_item_key
+from .models import News
+
+
+def news_order():
+    """Новости от новых к старым; id различает новости одной даты."""
+    return News.objects.order_by('-date', '-pk')
+
+
+def encode_cursor(news_date, pk):
+    """Курсор указывает на последнюю отданную новость."""
+    return f'{news_date.isoformat()}_{pk}'
+
+
+def decode_cursor(cursor):
+    try:
+        news_date, pk = cursor.split('_')
+        return date.fromisoformat(news_date), int(pk)
+    except ValueError:
+        raise BadRequest('Некорректный курсор.')
+
+
+def serialize_json(news):
+    return json.dumps({
+        'id': news.pk,
+        'title': news.title,
+        'date': news.date.isoformat(),
+        'url': reverse('news:detail', args=(news.pk,)),
+        'excerpt': news.excerpt,
+        'text': news.text,
+    }, ensure_ascii=False)
+
+
+def serialize_atom(news):
+    """
+    Элемент <entry>. Ссылка в нём относительная, адрес сайта задаёт
+    xml:base ленты, поэтому запись не зависит от хоста запроса.
+    """
+    published = datetime.combine(
+        news.date, time.min, tzinfo=timezone.get_default_timezone()
+    )
+    feed = Atom1Feed(title='', link='', description='')
+    feed.add_item(
+        title=news.title,
+        link=reverse('news:detail', args=(news.pk,)),
+        description=escape(news.text),
+        unique_id=f'urn:yanews:news:{news.pk}',
+        pubdate=published,
+        updateddate=published,
+    )
+    output = StringIO()
+    handler = SimplerXMLGenerator(output, 'utf-8')
+    handler.startElement('entry', {})
+    feed.add_item_elements(handler, feed.items[0])
+    handler.endElement('entry')
+    return output.getvalue()
+
+
+SERIALIZERS = {ATOM: serialize_atom, JSON: serialize_json}
+
+
+def item_keys(chunk, feed_format):
+    return {feed_item_key(feed_format, pk): pk for pk in chunk}
+
+
+def serialize_missing(news_list, feed_format):
+    serialize = SERIALIZERS[feed_format]
+    return {
+        feed_item_key(feed_format, news.pk): serialize(news)
+        for news in news_list
+    }
+
+
+def ordered_items(keys, items):
+    # Новость могла быть удалена, пока читалась лента.
+    return [items[key] for key in keys if key in items]
+
+
+def serialize_chunk(chunk, feed_format):
+    """Сериализованные новости порции: из кеша, недостающие — из базы."""
+    keys = item_keys(chunk, feed_format)
+    items = cache.get_many(keys)
+    missing = [pk for key, pk in keys.items() if key not in items]
+    if missing:
+        fresh = serialize_missing(
+            News.objects.filter(pk__in=missing), feed_format
+        )
+        cache.set_many(fresh, settings.NEWS_FEED_CACHE_TIMEOUT)
+        items.update(fresh)
+    return ordered_items(keys, items)
+
+
+async def aserialize_chunk(chunk, feed_format):
+    """Асинхронный вариант serialize_chunk()."""
+    keys = item_keys(chunk, feed_format)
+    items = await cache.aget_many(keys)
+    missing = [pk for key, pk in keys.items() if key not in items]
+    if missing:
+        fresh = serialize_missing(
+            [news async for news in News.objects.filter(pk__in=missing)],
+            feed_format
+        )
+        await cache.aset_many(fresh, settings.NEWS_FEED_CACHE_TIMEOUT)
+        items.update(fresh)
+    return ordered_items(keys, items)
+
+
+def serialized_items(ids, feed_format):
+    """Сериализованные новости в порядке ids, порциями из кеша."""
+    while chunk := list(islice(ids, settings.NEWS_FEED_CHUNK_SIZE)):
+        yield from serialize_chunk(chunk, feed_format)
+
+
+async def aserialized_items(ids, feed_format):
+    """Асинхронный вариант serialized_items() для асинхронного ids."""
+    chunk = []
+    async for pk in ids:
+        chunk.append(pk)
+        if len(chunk) == settings.NEWS_FEED_CHUNK_SIZE:
+            for item in await aserialize_chunk(chunk, feed_format):
+                yield item
+            chunk = []
+    if chunk:
+        for item in await aserialize_chunk(chunk, feed_format):
+            yield item
+
+
+def atom_header(request):
+    """Начало документа Atom до первой записи."""
+    feed = Atom1Feed(
+        title='YaNews',
+        link=request.build_absolute_uri(reverse('news:home')),
+        description='',
+        feed_url=request.build_absolute_uri(),
+        language=settings.LANGUAGE_CODE,
+    )
+    output = StringIO()
+    handler = SimplerXMLGenerator(output, 'utf-8')
+    handler.startDocument()
+    handler.startElement('feed', {
+        **feed.root_attributes(),
+        'xml:base': request.build_absolute_uri('/'),
+    })
+    feed.add_root_elements(handler)
+    return output.getvalue()
+
+
+def atom_ids():
+    return news_order().values_list('pk', flat=True)
+
+
+def atom_feed(request):
+    """Весь архив новостей в формате Atom."""
+    yield atom_header(request)
+    ids = atom_ids().iterator(chunk_size=settings.NEWS_FEED_CHUNK_SIZE)
+    yield from serialized_items(ids, ATOM)
+    yield '</feed>'
+
+
+async def aatom_feed(request):
+    """Асинхронный вариант atom_feed()."""
+    yield atom_header(request)
+    ids = atom_ids().aiterator(chunk_size=settings.NEWS_FEED_CHUNK_SIZE)
+    async for item in aserialized_items(ids, ATOM):
+        yield item
+    yield '</feed>'
+
+
+def page_limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.NEWS_FEED_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest('Некорректный размер страницы.')
+    if not 0 < limit <= settings.NEWS_FEED_MAX_PAGE_SIZE:
+        raise BadRequest('Некорректный размер страницы.')
+    return limit
+
+
+def json_page(request):
+    """
+    Выборка date и id для страницы JSON-ленты и её размер.
+
+    Параметры проверяются до начала потока, чтобы ошибка вернулась
+    статусом 400. Строки — словари: values_list() с несколькими полями
+    выполняет запрос уже при создании aiterator(), вне потока.
+    """
+    limit = page_limit(request)
+    news = news_order()
+    cursor = request.GET.get('cursor')
+    if cursor:
+        news_date, pk = decode_cursor(cursor)
+        news = news.filter(
+            Q(date__lt=news_date) | Q(date=news_date, pk__lt=pk)
+        )
+    return news.values('date', 'pk')[:limit + 1], limit
+
+
+def next_page_url(request, limit, last):
+    return request.build_absolute_uri(
+        f'{request.path}?limit={limit}&cursor={encode_cursor(*last)}'
+    )
+
+
+def json_feed(request):
+    """
+    Страница новостей в JSON: {"items": [...], "next": адрес или null}.
+
+    Страницы переключаются курсором по ключу (date, id), как
+    комментарии в news.pagination.
+    """
+    rows, limit = json_page(request)
+    rows = rows.iterator(chunk_size=settings.NEWS_FEED_CHUNK_SIZE)
+    page = {'next': None}
+
+    def ids():
+        last = None
+        for number, row in enumerate(rows):
+            if number == limit:
+                page['next'] = next_page_url(request, limit, last)
+                return
+            last = row['date'], row['pk']
+            yield row['pk']
+
+    def stream():
+        yield '{"items": ['
+        for number, item in enumerate(serialized_items(ids(), JSON)):
+            yield item if number == 0 else ', ' + item
+        yield f'], "next": {json.dumps(page["next"])}}}'
+
+    return stream()
+
+
+def ajson_feed(request):
+    """Асинхронный вариант json_feed()."""
+    rows, limit = json_page(request)
+    rows = rows.aiterator(chunk_size=settings.NEWS_FEED_CHUNK_SIZE)
+    page = {'next': None}
+
+    async def ids():
+        last = None
+        number = 0
+        async for row in rows:
+            if number == limit:
+                page['next'] = next_page_url(request, limit, last)
+                return
+            last = row['date'], row['pk']
+            number += 1
+            yield row['pk']
+
+    async def stream():
+        yield '{"items": ['
+        separator = ''
+        async for item in aserialized_items(ids(), JSON):
+            yield separator + item
+            separator = ', '
+        yield f'], "next": {json.dumps(page["next"])}}}'
+
+    return stream()
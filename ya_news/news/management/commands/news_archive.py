@@ -0,0 +1,135 @@
+import json
+import sys
+from contextlib import nullcontext
+from datetime import date, datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from news.cache import HOME, bump_generations, news_key
+from news.models import (
+    Comment, News, NewsMonthCount, make_excerpt, month_of
+)
+
+# Порядок важен: при импорте новости создаются раньше комментариев.
+MODELS = {
+    'news.news': News,
+    'news.comment': Comment,
+}
+
+
+def to_json(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} не сериализуется в JSON')
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковый импорт и экспорт новостей и комментариев в формате '
+        'NDJSON: по объекту на строку, как в dumpdata --format jsonl.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=('import', 'export'))
+        parser.add_argument('path', help='путь к файлу или - для stdin/stdout')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='число объектов в одной транзакции или выборке'
+        )
+
+    def handle(self, action, path, batch_size, **options):
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть положительным.')
+        if path == '-':
+            stream = nullcontext(
+                self.stdout if action == 'export' else sys.stdin
+            )
+        else:
+            stream = open(
+                path, 'w' if action == 'export' else 'r', encoding='utf-8'
+            )
+        with stream as stream:
+            if action == 'export':
+                self.export(stream, batch_size)
+            else:
+                self.load(stream, batch_size)
+
+    def export(self, stream, batch_size):
+        """Выгружает таблицы частями через iterator(), не держа их в памяти."""
+        for label, model in MODELS.items():
+            fields = [
+                field for field in model._meta.concrete_fields
+                if not field.primary_key
+            ]
+            rows = model.objects.order_by('pk').values_list(
+                'pk', *(field.attname for field in fields)
+            ).iterator(chunk_size=batch_size)
+            for pk, *values in rows:
+                stream.write(json.dumps({
+                    'model': label,
+                    'pk': pk,
+                    'fields': {
+                        field.name: value
+                        for field, value in zip(fields, values)
+                    },
+                }, ensure_ascii=False, default=to_json) + '\n')
+
+    def load(self, stream, batch_size):
+        """Загружает объекты пачками через bulk_create."""
+        batch = {model: [] for model in MODELS.values()}
+        size = total = 0
+        for number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            batch_model, obj = self.parse(line, number)
+            batch[batch_model].append(obj)
+            size += 1
+            if size == batch_size:
+                total += self.flush(batch)
+                size = 0
+        total += self.flush(batch)
+        self.stdout.write(f'Загружено объектов: {total}')
+
+    def parse(self, line, number):
+        try:
+            data = json.loads(line)
+            model = MODELS[data['model']]
+            obj = model(pk=data['pk'], **{
+                field.attname: field.to_python(value)
+                for field, value in (
+                    (model._meta.get_field(name), value)
+                    for name, value in data['fields'].items()
+                )
+            })
+        except (ValueError, TypeError, KeyError, FieldDoesNotExist,
+                ValidationError) as error:
+            raise CommandError(f'Строка {number}: {error!r}')
+        if model is News:
+            # bulk_create не вызывает save(), где считается начало текста.
+            obj.excerpt = make_excerpt(obj.text)
+        return model, obj
+
+    def flush(self, batch):
+        """
+        Сохраняет пачку в одной транзакции, сбрасывает кеш страниц
+        и обновляет счётчики архива: bulk_create не отправляет сигналов.
+        """
+        news_ids = set()
+        months = set()
+        count = 0
+        with transaction.atomic():
+            for model, objs in batch.items():
+                model.objects.bulk_create(objs)
+                news_ids.update(
+                    obj.pk if model is News else obj.news_id for obj in objs
+                )
+                if model is News:
+                    months.update(month_of(obj.date) for obj in objs)
+                count += len(objs)
+                objs.clear()
+            NewsMonthCount.objects.refresh(months)
+        if count:
+            bump_generations(HOME, *map(news_key, news_ids))
+        return count
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from news.search import create_index, drop_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересоздаёт полнотекстовый индекс новостей и его триггеры '
+        'и заново заполняет индекс.'
+    )
+
+    def handle(self, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(
+                'Полнотекстовый индекс FTS5 есть только на SQLite.'
+            )
+        with transaction.atomic():
+            drop_index(connection)
+            create_index(connection)
+        self.stdout.write('Поисковый индекс пересоздан.')
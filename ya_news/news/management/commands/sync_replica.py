@@ -0,0 +1,48 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from yanews.routers import REPLICA, mark_replica_synced, replica_available
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплику через backup API. '
+        'С --interval повторяет копирование, имитируя отставание реплики.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            help='копировать раз в указанное число секунд, пока не прервут'
+        )
+
+    def handle(self, interval, **options):
+        if not replica_available():
+            raise CommandError('Реплика не настроена в DATABASES.')
+        source, replica = connections[DEFAULT_DB_ALIAS], connections[REPLICA]
+        if source.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError('Копирование поддерживается только для SQLite.')
+        while True:
+            self.sync(source, replica)
+            if interval is None:
+                return
+            time.sleep(interval)
+
+    def sync(self, source, replica):
+        # Открытое соединение с репликой держало бы старые страницы.
+        replica.close()
+        source.ensure_connection()
+        target = sqlite3.connect(replica.settings_dict['NAME'])
+        # Копия содержит всё, что зафиксировано до начала копирования.
+        started = time.time_ns()
+        try:
+            source.connection.backup(target)
+            mark_replica_synced(target, started)
+        finally:
+            target.close()
+        self.stdout.write(
+            f'Реплика {replica.settings_dict["NAME"]} обновлена.'
+        )
@@ -0,0 +1,72 @@
+from django.db import migrations
+
+# SQL скопирован из news.search на момент миграции, чтобы её результат
+# не зависел от дальнейших изменений модуля.
+CREATE_INDEX = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS news_news_fts
+    USING fts5(title, text, content='news_news', content_rowid='id')
+    """,
+    "INSERT INTO news_news_fts(news_news_fts, rank) "
+    "VALUES ('rank', 'bm25(10.0, 1.0)')",
+    """
+    CREATE TRIGGER IF NOT EXISTS news_news_fts_insert
+    AFTER INSERT ON news_news
+    BEGIN
+        INSERT INTO news_news_fts(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS news_news_fts_delete
+    AFTER DELETE ON news_news
+    BEGIN
+        INSERT INTO news_news_fts(news_news_fts, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS news_news_fts_update
+    AFTER UPDATE OF title, text ON news_news
+    BEGIN
+        INSERT INTO news_news_fts(news_news_fts, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+        INSERT INTO news_news_fts(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+    "INSERT INTO news_news_fts(news_news_fts) VALUES ('rebuild')",
+)
+
+DROP_INDEX = (
+    'DROP TRIGGER IF EXISTS news_news_fts_insert',
+    'DROP TRIGGER IF EXISTS news_news_fts_delete',
+    'DROP TRIGGER IF EXISTS news_news_fts_update',
+    'DROP TABLE IF EXISTS news_news_fts',
+)
+
+
+def run(schema_editor, statements):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def forwards(apps, schema_editor):
+    run(schema_editor, CREATE_INDEX)
+
+
+def backwards(apps, schema_editor):
+    run(schema_editor, DROP_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0003_comment_created_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
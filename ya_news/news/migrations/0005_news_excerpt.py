@@ -0,0 +1,85 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:05
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+BATCH_SIZE = 1000
+
+# Копии news.models.make_excerpt и триггеров из news.search на момент
+# миграции, чтобы её результат не зависел от дальнейших изменений.
+EXCERPT_WORDS = 15
+
+SEARCH_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS news_news_fts_insert
+    AFTER INSERT ON news_news
+    BEGIN
+        INSERT INTO news_news_fts(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS news_news_fts_delete
+    AFTER DELETE ON news_news
+    BEGIN
+        INSERT INTO news_news_fts(news_news_fts, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS news_news_fts_update
+    AFTER UPDATE OF title, text ON news_news
+    BEGIN
+        INSERT INTO news_news_fts(news_news_fts, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+        INSERT INTO news_news_fts(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+)
+
+
+def make_excerpt(text):
+    return Truncator(text).words(EXCERPT_WORDS, truncate=' …')
+
+
+def fill_excerpts(apps, schema_editor):
+    News = apps.get_model('news', 'News')
+    batch = []
+    for news in News.objects.only('pk', 'text').iterator(BATCH_SIZE):
+        news.excerpt = make_excerpt(news.text)
+        batch.append(news)
+        if len(batch) == BATCH_SIZE:
+            News.objects.bulk_update(batch, ('excerpt',))
+            batch.clear()
+    News.objects.bulk_update(batch, ('excerpt',))
+
+
+def restore_search_index(apps, schema_editor):
+    """SQLite пересоздал news_news при добавлении поля, а с ним и триггеры."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in SEARCH_TRIGGERS:
+        schema_editor.execute(sql)
+    schema_editor.execute(
+        "INSERT INTO news_news_fts(news_news_fts) VALUES ('rebuild')"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0004_news_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='excerpt',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+        migrations.RunPython(
+            restore_search_index, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:16
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_month_counts(apps, schema_editor):
+    """Единственный раз группирует всю таблицу, дальше счётчики
+    обновляют сигналы.
+    """
+    News = apps.get_model('news', 'News')
+    NewsMonthCount = apps.get_model('news', 'NewsMonthCount')
+    NewsMonthCount.objects.bulk_create(
+        NewsMonthCount(year=row['date__year'], month=row['date__month'],
+                       count=row['count'])
+        for row in News.objects.order_by().values(
+            'date__year', 'date__month'
+        ).annotate(count=Count('pk'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0005_news_excerpt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsMonthCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField()),
+            ],
+            options={
+                'ordering': ('-year', '-month'),
+                'constraints': [models.UniqueConstraint(fields=('year', 'month'), name='news_month_count_unique')],
+            },
+        ),
+        migrations.RunPython(fill_month_counts, migrations.RunPython.noop),
+    ]
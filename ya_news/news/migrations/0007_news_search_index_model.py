@@ -0,0 +1,26 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0006_news_month_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsSearchIndex',
+            fields=[
+                ('news', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='news.news')),
+                ('document', models.TextField(db_column='news_news_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'news_news_fts',
+                'managed': False,
+            },
+        ),
+    ]
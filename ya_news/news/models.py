@@ -1,37 +1,188 @@
-from datetime import datetime
+from datetime import date, datetime
 
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
+from django.utils.text import Truncator
+
+EXCERPT_WORDS = 15
+
+
+def make_excerpt(text):
+    """То же, что фильтр truncatewords с длиной EXCERPT_WORDS."""
+    return Truncator(text).words(EXCERPT_WORDS, truncate=' …')
+
+
+class NewsQuerySet(models.QuerySet):
+
+    def with_comment_count(self):
+        """
+        Добавляет число комментариев коррелированным подзапросом.
+
+        В отличие от Count() с GROUP BY подзапрос выполняется только
+        для строк, попавших на страницу после LIMIT.
+        """
+        comment_count = Comment.objects.filter(
+            news=models.OuterRef('pk')
+        ).order_by().annotate(
+            count=models.Func(models.F('pk'), function='COUNT')
+        ).values('count')
+        return self.annotate(comment_count=models.Subquery(comment_count))
 
 
 class News(models.Model):
     title = models.CharField(max_length=50)
     text = models.TextField()
+    # Начало текста для главной страницы, см. news.signals.fill_excerpt.
+    excerpt = models.TextField(editable=False, default='')
     date = models.DateField(default=datetime.today)
 
+    objects = NewsQuerySet.as_manager()
+
     class Meta:
         ordering = ('-date',)
+        indexes = (
+            # Главная страница: ORDER BY date DESC LIMIT n.
+            models.Index(fields=('-date',), name='news_date_idx'),
+        )
         verbose_name_plural = 'Новости'
         verbose_name = 'Новость'
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        news = super().from_db(db, field_names, values)
+        # Дата из базы: если её изменят, новость перейдёт в другой месяц
+        # архива, и счётчик прежнего месяца тоже нужно обновить.
+        news._loaded_date = news.__dict__.get('date')
+        return news
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'text' in update_fields:
+            # Начало текста заполняет сигнал, оно сохраняется вместе
+            # с текстом.
+            kwargs['update_fields'] = {*update_fields, 'excerpt'}
+        super().save(*args, **kwargs)
+
+
+class NewsSearchIndex(models.Model):
+    """
+    Полнотекстовый индекс новостей на SQLite, см. news.search.
+
+    Виртуальную таблицу FTS5 создают миграции, модель лишь позволяет
+    соединять её с новостями в запросах ORM. Поле document — скрытый
+    столбец FTS5 с именем таблицы: он стоит слева от MATCH и первым
+    аргументом функций highlight() и snippet().
+    """
+    news = models.OneToOneField(
+        News,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        related_name='search_index',
+    )
+    document = models.TextField(db_column='news_news_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'news_news_fts'
+
+
+def month_of(value):
+    return value.year, value.month
+
+
+def month_bounds(year, month):
+    """Первый день месяца и первый день следующего."""
+    return date(year, month, 1), date(year + month // 12, month % 12 + 1, 1)
+
+
+class NewsMonthCountManager(models.Manager):
+
+    def refresh(self, months):
+        """
+        Пересчитывает число новостей за месяцы — пары (год, месяц).
+
+        Пересчёт, а не прибавление единицы, не накапливает ошибок
+        от параллельных изменений и сохранений в обход сигналов.
+        Условие по диапазону дат читает только нужный участок индекса
+        news_date_idx.
+        """
+        for year, month in months:
+            start, end = month_bounds(year, month)
+            count = News.objects.filter(
+                date__gte=start, date__lt=end
+            ).count()
+            if count:
+                self.bulk_create(
+                    [self.model(year=year, month=month, count=count)],
+                    update_conflicts=True,
+                    unique_fields=('year', 'month'),
+                    update_fields=('count',),
+                )
+            else:
+                self.filter(year=year, month=month).delete()
+
+
+class NewsMonthCount(models.Model):
+    """
+    Число новостей за месяц для навигации по архиву.
+
+    Обновляется сигналами при сохранении и удалении новостей, см.
+    news.signals, поэтому боковая панель архива не группирует всю
+    таблицу новостей на каждый запрос.
+    """
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField()
+
+    objects = NewsMonthCountManager()
+
+    class Meta:
+        ordering = ('-year', '-month')
+        constraints = (
+            models.UniqueConstraint(
+                fields=('year', 'month'), name='news_month_count_unique'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.month:02}.{self.year}: {self.count}'
+
+    @property
+    def first_day(self):
+        return date(self.year, self.month, 1)
+
 
 class Comment(models.Model):
     news = models.ForeignKey(
         News,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        # Покрывается составным индексом comment_news_created_idx.
+        db_index=False,
     )
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
     text = models.TextField()
-    created = models.DateTimeField(auto_now_add=True)
+    # Не auto_now_add: при импорте архива время создания сохраняется.
+    created = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         ordering = ('created',)
+        indexes = (
+            # Комментарии новости: WHERE news_id = ? ORDER BY created, id.
+            # id входит в индекс неявно как первичный ключ.
+            models.Index(
+                fields=('news', 'created'), name='comment_news_created_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:50]
@@ -0,0 +1,68 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+
+# Отметка конца слова в префиксном дереве.
+END = ''
+# Шаблон, который ничему не соответствует, — для пустого списка слов.
+NEVER = '(?!)'
+
+
+def build_pattern(words):
+    """
+    Собирает регулярное выражение по префиксному дереву слов.
+
+    Общие префиксы слов сливаются в одну ветку, поэтому движок
+    регулярных выражений проходит текст один раз и в каждой позиции
+    спускается по дереву, а не перебирает все слова по очереди.
+    """
+    trie = {}
+    for word in words:
+        if not word:
+            continue
+        node = trie
+        for char in word.lower():
+            if END in node:
+                # Более короткое слово уже является префиксом этого.
+                break
+            node = node.setdefault(char, {})
+        else:
+            node.clear()
+            node[END] = True
+    return _node_pattern(trie) if trie else NEVER
+
+
+def _node_pattern(node):
+    leaves = []
+    branches = []
+    for char, child in sorted(node.items()):
+        if END in child:
+            leaves.append(re.escape(char))
+        else:
+            branches.append(re.escape(char) + _node_pattern(child))
+    if len(leaves) == 1:
+        branches.append(leaves[0])
+    elif leaves:
+        branches.append('[' + ''.join(leaves) + ']')
+    if len(branches) == 1:
+        return branches[0]
+    return '(?:' + '|'.join(branches) + ')'
+
+
+@lru_cache(maxsize=1)
+def compile_matcher(words):
+    """Компилирует шаблон один раз для каждого набора слов."""
+    return re.compile(build_pattern(words))
+
+
+def find_bad_word(text):
+    """
+    Возвращает первое найденное в тексте запрещённое слово или None.
+
+    Список берётся из settings.BAD_WORDS; при его изменении шаблон
+    пересобирается автоматически.
+    """
+    matcher = compile_matcher(tuple(settings.BAD_WORDS))
+    match = matcher.search(text.lower())
+    return match.group() if match else None
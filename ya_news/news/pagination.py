@@ -0,0 +1,70 @@
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from django.db.models import Q
+
+from .models import Comment
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+CommentPage = namedtuple('CommentPage', ('comments', 'next_cursor'))
+
+
+def encode_cursor(comment):
+    """Курсор указывает на последний показанный комментарий."""
+    micros = (comment.created - EPOCH) // MICROSECOND
+    return f'{micros}_{comment.pk}'
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор на пару (created, id)."""
+    try:
+        micros, pk = map(int, cursor.split('_'))
+        return EPOCH + micros * MICROSECOND, pk
+    except (ValueError, OverflowError):
+        raise BadRequest('Некорректный курсор.')
+
+
+def get_comment_queryset(news_id, cursor=None):
+    """Комментарии к новости, начиная с позиции после курсора."""
+    comments = Comment.objects.filter(
+        news_id=news_id
+    ).select_related('author').order_by('created', 'pk')
+    if cursor:
+        created, pk = decode_cursor(cursor)
+        # Условие created >= ? позволяет начать чтение индекса
+        # (news, created) сразу с нужной позиции.
+        comments = comments.filter(
+            Q(created__gt=created) | Q(pk__gt=pk), created__gte=created
+        )
+    return comments
+
+
+def get_comment_page(news_id, cursor=None):
+    """
+    Возвращает очередную страницу комментариев к новости.
+
+    Вместо OFFSET используется условие по ключу (created, id), поэтому
+    стоимость запроса не зависит от того, насколько далеко пролистан
+    список комментариев.
+    """
+    size = settings.COMMENTS_COUNT_ON_PAGE
+    page = list(get_comment_queryset(news_id, cursor)[:size + 1])
+    if len(page) > size:
+        return CommentPage(page[:size], encode_cursor(page[size - 1]))
+    return CommentPage(page, None)
+
+
+async def aget_comment_page(news_id, cursor=None):
+    """Асинхронный вариант get_comment_page()."""
+    size = settings.COMMENTS_COUNT_ON_PAGE
+    page = [
+        comment async for comment
+        in get_comment_queryset(news_id, cursor)[:size + 1]
+    ]
+    if len(page) > size:
+        return CommentPage(page[:size], encode_cursor(page[size - 1]))
+    return CommentPage(page, None)
@@ -1,11 +1,19 @@
 import pytest
+from copy import deepcopy
 from datetime import datetime, timedelta
 
+from asgiref.sync import async_to_sync
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
 from django.test.client import Client
 from django.urls import reverse
+from django.utils import timezone
 
+from news.cache import HOME, bump_generations, news_key
 from news.models import News, Comment
+from yanews.metrics import store
+from yanews.routers import REPLICA
 from yanews.settings import BAD_WORDS, NEWS_COUNT_ON_HOME_PAGE
 
 User = get_user_model()
@@ -13,7 +21,13 @@ User = get_user_model()
 HOME_URL = reverse('news:home')
 LOGIN_URL = reverse('users:login')
 SIGNUP_URL = reverse('users:signup')
+SEARCH_URL = reverse('news:search')
+METRICS_URL = reverse('metrics')
+ARCHIVE_URL = reverse('news:archive')
+FEED_ATOM_URL = reverse('news:feed_atom')
+FEED_JSON_URL = reverse('news:feed_json')
 DETAIL_URL = 'news:detail'
+COMMENTS_URL = 'news:comments'
 EDIT_URL = 'news:edit'
 DELETE_URL = 'news:delete'
 
@@ -33,11 +47,75 @@ def signup_url():
     return SIGNUP_URL
 
 
+@pytest.fixture
+def search_url():
+    return SEARCH_URL
+
+
+@pytest.fixture
+def archive_url():
+    return ARCHIVE_URL
+
+
+@pytest.fixture
+def feed_atom_url():
+    return FEED_ATOM_URL
+
+
+@pytest.fixture
+def feed_json_url():
+    return FEED_JSON_URL
+
+
+@pytest.fixture
+def metrics_url():
+    return METRICS_URL
+
+
 @pytest.fixture(autouse=True)
 def enable_db_access_for_all_tests(db):
     pass
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def strict_query_budgets(settings):
+    settings.QUERY_BUDGET_RAISE = True
+
+
+@pytest.fixture
+def metrics_store(settings, tmp_path):
+    """Пустые метрики процесса с каталогом для сброса."""
+    settings.METRICS_DIR = tmp_path
+    store.reset()
+    yield store
+    store.reset()
+
+
+@pytest.fixture
+def replica(tmp_path):
+    """Реплика в отдельном файле.
+
+    Алиас replica настраивается переменной YANEWS_REPLICA_DB, поэтому
+    фикстура подключает реплику сама, не меняя DATABASES. Тесту нужна
+    отметка django_db с transaction=True: копируются только завершённые
+    транзакции.
+    """
+    primary = connections[DEFAULT_DB_ALIAS]
+    database = deepcopy(primary.settings_dict)
+    database['NAME'] = str(tmp_path / 'replica.sqlite3')
+    # Соединение создаётся напрямую: такие соединения тестам Django
+    # разрешены без перечисления в databases.
+    connections[REPLICA] = replica = type(primary)(database, REPLICA)
+    yield replica
+    replica.close()
+    del connections[REPLICA]
+
+
 @pytest.fixture
 def author(db):
     return User.objects.create(username='Тестовый пользователь')
@@ -55,6 +133,20 @@ def author_client(author):
     return client
 
 
+@pytest.fixture
+def author_async_client(author, async_client):
+    async_client.force_login(author)
+    return async_client
+
+
+@pytest.fixture
+def async_get():
+    """Выполняет запрос асинхронным клиентом из синхронного теста."""
+    def get(client, url, **kwargs):
+        return async_to_sync(client.get)(url, **kwargs)
+    return get
+
+
 @pytest.fixture
 def news(db):
     return News.objects.create(
@@ -94,7 +186,7 @@ def news_on_home_page():
 @pytest.fixture
 def comments(news, author):
     comment_list = []
-    today = datetime.today()
+    today = timezone.now()
     yesterday = today - timedelta(days=1)
 
     for i in range(NEWS_COUNT_ON_HOME_PAGE):
@@ -108,6 +200,20 @@ def comments(news, author):
     return comment_list
 
 
+@pytest.fixture
+def make_comments(news, author):
+    """Фабрика для быстрого создания большого числа комментариев."""
+    def make(count):
+        comments = Comment.objects.bulk_create(
+            Comment(news=news, author=author, text=f'Комментарий {i}')
+            for i in range(count)
+        )
+        # bulk_create не отправляет сигналы, сбрасываем кеш вручную.
+        bump_generations(HOME, news_key(news.pk))
+        return comments
+    return make
+
+
 @pytest.fixture
 def bad_words_data():
     bad_words_data = {
@@ -137,6 +243,11 @@ def news_detail_url(news):
     return reverse(DETAIL_URL, args=(news.id,))
 
 
+@pytest.fixture
+def news_comments_url(news):
+    return reverse(COMMENTS_URL, args=(news.id,))
+
+
 @pytest.fixture
 def order_news():
     news_list = []
@@ -153,6 +264,18 @@ def order_news():
     return news_list
 
 
+@pytest.fixture
+def admin_news_url(news):
+    return reverse('admin:news_news_change', args=(news.pk,))
+
+
+@pytest.fixture
+def admin_comments_url(news):
+    return reverse('admin:news_comment_changelist') + (
+        f'?news__id__exact={news.pk}'
+    )
+
+
 @pytest.fixture
 def edit_comment_url(comment):
     return reverse(EDIT_URL, args=(comment.id,))
@@ -1,4 +1,23 @@
+import json
+import re
+import time
+import tracemalloc
+from datetime import date
+from http import HTTPStatus
+from xml.etree import ElementTree
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils.http import http_date
+from pytest_lazy_fixtures import lf
+
+from news.async_views import AsyncNewsDetailView, AsyncNewsList
 from news.forms import CommentForm
+from news.models import Comment, News, NewsMonthCount, make_excerpt
+from news.pagination import get_comment_queryset
+from news.views import NewsList
 from yanews.settings import NEWS_COUNT_ON_HOME_PAGE
 
 
@@ -10,6 +29,107 @@ def test_news_count_on_home_page(client, news_on_home_page, home_url):
     assert len(response.context['news_list']) <= NEWS_COUNT_ON_HOME_PAGE
 
 
+@pytest.mark.parametrize('comment_count', (1, 200))
+def test_home_page_queries_do_not_grow_with_comments(
+        client, home_url, make_comments, comment_count,
+        django_assert_num_queries
+):
+    """Тест постоянного числа запросов на главной странице
+    независимо от количества комментариев
+    """
+    make_comments(comment_count)
+
+    with django_assert_num_queries(1):
+        response = client.get(home_url)
+
+    news_obj, = response.context['news_list']
+    assert news_obj.comment_count == comment_count
+    assert f'Комментариев: {comment_count}' in response.content.decode()
+
+
+def test_home_page_does_not_load_news_text(client, home_url, news,
+                                           django_assert_num_queries):
+    """Тест того, что главная выводит сохранённое начало текста,
+    не загружая сам текст
+    """
+    news.text = ' '.join(f'слово{i}' for i in range(100))
+    news.save()
+
+    with django_assert_num_queries(1) as context:
+        response = client.get(home_url)
+
+    assert '"news_news"."text"' not in context.captured_queries[0]['sql']
+    content = response.content.decode()
+    assert make_excerpt(news.text) in content
+    assert 'слово15' not in content
+
+
+def test_excerpt_follows_text(news):
+    """Тест обновления начала текста при сохранении новости"""
+    news.text = 'Новый текст'
+    news.save(update_fields=('text',))
+    news.refresh_from_db()
+    assert news.excerpt == 'Новый текст'
+
+
+@pytest.mark.parametrize('comment_count', (1, 200))
+def test_admin_news_page_does_not_load_comments(
+        admin_client, admin_news_url, make_comments, comment_count,
+        django_assert_num_queries
+):
+    """Тест того, что страница новости в админке не выводит
+    комментарии и число запросов к ней постоянно
+    """
+    make_comments(comment_count)
+    admin_client.get(admin_news_url)
+
+    # Сессия, пользователь и новость с числом комментариев; change_view
+    # выполняется в транзакции, отсюда ещё два запроса точки сохранения.
+    with django_assert_num_queries(5):
+        response = admin_client.get(admin_news_url)
+
+    content = response.content.decode()
+    assert 'Комментарий 0' not in content
+    assert f'news__id__exact={response.context["original"].pk}' in content
+
+
+def test_admin_comments_are_filtered_by_news(admin_client, make_comments,
+                                             admin_comments_url, author):
+    """Тест списка комментариев в админке, отфильтрованного по новости"""
+    make_comments(3)
+    other_news = News.objects.create(title='Другая', text='Другая')
+    Comment.objects.create(news=other_news, author=author, text='Чужой')
+
+    response = admin_client.get(admin_comments_url)
+
+    comments = response.context['cl'].result_list
+    assert len(comments) == 3
+    assert other_news not in {comment.news for comment in comments}
+
+
+def test_home_page_memory_does_not_grow_with_comments(
+        client, home_url, make_comments
+):
+    """Тест того, что комментарии не загружаются в память
+    при отображении главной страницы
+    """
+    def peak_memory():
+        cache.clear()
+        tracemalloc.start()
+        client.get(home_url)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    make_comments(5)
+    client.get(home_url)
+    small_peak = peak_memory()
+    make_comments(2000)
+    large_peak = peak_memory()
+
+    assert large_peak < small_peak * 1.5
+
+
 def test_comment_order(client, news, comments, news_detail_url):
     """Тест сортировки комментариев в хронологическом порядке на
     странице отдельной новости
@@ -26,6 +146,54 @@ def test_comment_order(client, news, comments, news_detail_url):
         assert comments_list[i].created <= comments_list[i + 1].created
 
 
+def test_comments_are_paginated_by_cursor(
+        client, make_comments, news_detail_url, news_comments_url, settings,
+        django_assert_num_queries
+):
+    """Тест постраничного вывода комментариев: страницы не пересекаются,
+    а число запросов на каждую страницу не зависит от её номера
+    """
+    settings.COMMENTS_COUNT_ON_PAGE = 3
+    expected = [comment.pk for comment in make_comments(8)]
+
+    response = client.get(news_detail_url)
+    shown = [comment.pk for comment in response.context['comments']]
+    cursor = response.context['next_cursor']
+    while cursor:
+        with django_assert_num_queries(2):
+            response = client.get(news_comments_url, {'after': cursor})
+        page = [comment.pk for comment in response.context['comments']]
+        assert len(page) <= settings.COMMENTS_COUNT_ON_PAGE
+        shown += page
+        cursor = response.context['next_cursor']
+
+    assert shown == expected
+
+
+def test_home_page_query_uses_indexes():
+    """Тест плана запроса главной страницы: новости читаются по индексу
+    даты, комментарии считаются по составному индексу без сортировки
+    """
+    plan = NewsList().get_queryset().explain()
+
+    assert 'SCAN news_news USING INDEX news_date_idx' in plan
+    assert 'USING COVERING INDEX comment_news_created_idx' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+@pytest.mark.parametrize('cursor', (None, '0_0'))
+def test_comments_query_uses_index(news, cursor, settings):
+    """Тест плана запроса страницы комментариев: чтение по составному
+    индексу с позиции курсора без временной сортировки
+    """
+    size = settings.COMMENTS_COUNT_ON_PAGE
+    plan = get_comment_queryset(news.pk, cursor)[:size + 1].explain()
+
+    expected = '(news_id=? AND created>?)' if cursor else '(news_id=?)'
+    assert f'USING INDEX comment_news_created_idx {expected}' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
 def test_news_order(client, order_news, home_url):
     """Тест сортировки новостей в хронологическом порядке на
     домашней странице
@@ -58,3 +226,395 @@ def test_authorized_client_has_form(author_client, news, news_detail_url):
 
     assert 'form' in response.context
     assert isinstance(response.context['form'], CommentForm)
+
+
+def test_anonymous_pages_are_cached(client, comment, home_url,
+                                    news_detail_url,
+                                    django_assert_num_queries):
+    """Тест того, что анонимный пользователь получает страницы из кеша"""
+    for url in (home_url, news_detail_url):
+        expected = client.get(url).content
+        with django_assert_num_queries(0):
+            response = client.get(url)
+        assert response.content == expected
+
+
+def test_cached_pages_are_invalidated(client, news, author, home_url,
+                                      news_detail_url):
+    """Тест сброса кеша страниц при изменении новостей и комментариев"""
+    client.get(home_url)
+    client.get(news_detail_url)
+
+    Comment.objects.create(news=news, author=author, text='Свежий')
+    assert 'Свежий' in client.get(news_detail_url).content.decode()
+    assert 'Комментариев: 1' in client.get(home_url).content.decode()
+
+    news.title = 'Новый заголовок'
+    news.save()
+    assert 'Новый заголовок' in client.get(home_url).content.decode()
+
+
+def test_cached_page_keeps_per_user_parts(client, author_client, comment,
+                                          news_detail_url,
+                                          edit_comment_url):
+    """Тест того, что персональные части страницы не попадают в кеш
+    и отображаются авторизованному пользователю
+    """
+    client.get(news_detail_url)
+
+    response = author_client.get(news_detail_url)
+    content = response.content.decode()
+    assert 'Пользователь: ' in content
+    assert edit_comment_url in content
+    assert isinstance(response.context['form'], CommentForm)
+
+    content = client.get(news_detail_url).content.decode()
+    assert 'Пользователь: ' not in content
+    assert edit_comment_url not in content
+
+
+def test_search_ranks_and_highlights(client, search_url,
+                                     django_assert_num_queries):
+    """Тест порядка результатов поиска и выделения совпадений"""
+    in_text = News.objects.create(
+        title='Погода', text='Завтра <b>снегопад</b> и гололёд'
+    )
+    in_title = News.objects.create(title='Снегопад', text='Дороги')
+    News.objects.create(title='Спорт', text='Футбол')
+
+    with django_assert_num_queries(2):
+        response = client.get(search_url, {'q': 'снегопад'})
+
+    results = response.context['object_list']
+    assert results == [in_title, in_text]
+    assert results[0].title_highlight == '<mark>Снегопад</mark>'
+    assert '&lt;b&gt;<mark>снегопад</mark>&lt;/b&gt;' in results[1].snippet
+
+
+def test_search_index_follows_changes(client, news, search_url):
+    """Тест того, что индекс обновляется при изменении новостей,
+    в том числе в обход сигналов
+    """
+    def found(query):
+        return client.get(search_url, {'q': query}).context['object_list']
+
+    assert found('новост') == [news]
+    News.objects.filter(pk=news.pk).update(
+        title='Обзор', text='Другое содержание'
+    )
+    assert found('новост') == []
+    assert found('содерж') == [news]
+    bulk = News.objects.bulk_create([News(title='Архив', text='Из архива')])
+    assert found('архив') == bulk
+    news.delete()
+    assert found('содерж') == []
+
+
+def test_search_is_paginated(client, search_url, settings):
+    """Тест разбиения результатов поиска на страницы"""
+    News.objects.bulk_create(
+        News(title=f'Новость {index}', text='Текст')
+        for index in range(settings.NEWS_SEARCH_RESULTS_ON_PAGE + 1)
+    )
+    response = client.get(search_url, {'q': 'текст', 'page': 2})
+    assert len(response.context['object_list']) == 1
+    assert response.context['paginator'].count == (
+        settings.NEWS_SEARCH_RESULTS_ON_PAGE + 1
+    )
+
+
+def test_search_page_size_follows_settings(client, news, search_url,
+                                           settings):
+    """Тест того, что размер страницы поиска читается из настроек"""
+    settings.NEWS_SEARCH_RESULTS_ON_PAGE = 1
+    News.objects.create(title='Другая новость', text='Тестовая новость')
+    response = client.get(search_url, {'q': 'новость'})
+    assert len(response.context['object_list']) == 1
+    assert response.context['paginator'].num_pages == 2
+
+
+@pytest.mark.parametrize('query', ('', '"*:()', 'NEAR AND OR'))
+def test_search_ignores_syntax(client, news, search_url, query):
+    """Тест того, что операторы FTS5 в запросе не вызывают ошибок"""
+    response = client.get(search_url, {'q': query})
+    assert response.status_code == HTTPStatus.OK
+
+
+@pytest.mark.parametrize('url', (lf('home_url'), lf('news_detail_url')))
+def test_unchanged_page_is_not_modified(client, comment, url,
+                                        django_assert_num_queries):
+    """Тест ответа 304 без обращений к базе, если страница не менялась"""
+    response = client.get(url)
+    assert response['Vary'] == 'Cookie'
+    with django_assert_num_queries(0):
+        response = client.get(url, headers={'If-None-Match': response['ETag']})
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert not response.content
+
+
+def test_change_within_second_is_modified(client, news, author, home_url):
+    """Тест того, что If-Modified-Since не даёт устаревшего ответа 304"""
+    response = client.get(home_url)
+    assert 'Last-Modified' not in response
+    Comment.objects.create(news=news, author=author, text='Свежий')
+    response = client.get(home_url, headers={
+        'If-Modified-Since': http_date(time.time() + 60)
+    })
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_changed_page_is_modified(client, news, author, home_url,
+                                  news_detail_url):
+    """Тест того, что после нового комментария старый ETag не подходит"""
+    etags = {url: client.get(url)['ETag'] for url in (home_url,
+                                                      news_detail_url)}
+    Comment.objects.create(news=news, author=author, text='Свежий')
+    for url, etag in etags.items():
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == HTTPStatus.OK
+        assert response['ETag'] != etag
+
+
+def test_etag_depends_on_user(client, author_client, news,
+                              news_detail_url):
+    """Тест того, что страница анонима не подходит авторизованному"""
+    etag = client.get(news_detail_url)['ETag']
+    response = author_client.get(
+        news_detail_url, headers={'If-None-Match': etag}
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert 'form' in response.context
+    response = author_client.get(
+        news_detail_url, headers={'If-None-Match': response['ETag']}
+    )
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+
+@pytest.mark.urls('yanews.asgi_urls')
+def test_async_pages_match_sync(client, async_client, async_get, comment,
+                                home_url, news_detail_url):
+    """Тест того, что асинхронные представления под ASGI отдают те же
+    страницы, что и синхронные
+    """
+    for url, view_class in (
+        (home_url, AsyncNewsList),
+        (news_detail_url, AsyncNewsDetailView),
+    ):
+        response = async_get(async_client, url)
+        assert response.resolver_match.func.view_class is view_class
+        assert response.content == client.get(url).content
+
+
+@pytest.mark.urls('yanews.asgi_urls')
+def test_async_detail_for_authorized_client(author_async_client, async_get,
+                                            comment, news_detail_url,
+                                            edit_comment_url,
+                                            django_assert_num_queries):
+    """Тест персональных частей страницы новости в асинхронном режиме"""
+    with django_assert_num_queries(4):
+        response = async_get(author_async_client, news_detail_url)
+
+    content = response.content.decode()
+    assert 'Пользователь: ' in content
+    assert edit_comment_url in content
+    assert isinstance(response.context['form'], CommentForm)
+
+
+@pytest.mark.urls('yanews.asgi_urls')
+def test_async_unchanged_page_is_not_modified(async_client, async_get,
+                                              comment, news_detail_url):
+    """Тест условного запроса к асинхронному представлению"""
+    etag = async_get(async_client, news_detail_url)['ETag']
+    response = async_get(
+        async_client, news_detail_url, headers={'If-None-Match': etag}
+    )
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+
+def read_stream(response):
+    return b''.join(response.streaming_content).decode()
+
+
+def without_updated(feed):
+    return re.sub('<updated>[^<]*</updated>', '', feed, count=1)
+
+
+async def aread_stream(response):
+    return b''.join([chunk async for chunk in response]).decode()
+
+
+def test_json_feed_is_paginated(client, order_news, feed_json_url):
+    """Тест того, что страницы JSON-ленты по курсору покрывают все
+    новости от новых к старым
+    """
+    ids = []
+    url = f'{feed_json_url}?limit=4'
+    pages = 0
+    while url:
+        response = client.get(url)
+        assert response['Content-Type'] == 'application/json'
+        page = json.loads(read_stream(response))
+        assert len(page['items']) <= 4
+        ids += [item['id'] for item in page['items']]
+        url = page['next']
+        pages += 1
+    assert pages == 3
+    assert ids == list(
+        News.objects.order_by('-date', '-pk').values_list('pk', flat=True)
+    )
+
+
+def test_feed_items_are_cached(client, news_on_home_page, feed_json_url,
+                               settings, django_assert_num_queries):
+    """Тест того, что неизменившиеся новости не читаются из базы
+    повторно, а изменённая сериализуется заново
+    """
+    settings.NEWS_FEED_CHUNK_SIZE = 10
+    # Идентификаторы одним запросом и новости для двух порций.
+    with django_assert_num_queries(3):
+        read_stream(client.get(feed_json_url))
+    with django_assert_num_queries(1):
+        read_stream(client.get(feed_json_url))
+
+    news = news_on_home_page[0]
+    news.title = 'Обновлённая новость'
+    news.save()
+    with django_assert_num_queries(2):
+        page = json.loads(read_stream(client.get(feed_json_url)))
+    titles = {item['id']: item['title'] for item in page['items']}
+    assert titles[news.pk] == 'Обновлённая новость'
+    assert len(titles) == len(news_on_home_page)
+
+
+def test_atom_feed(client, news_on_home_page, feed_atom_url):
+    """Тест Atom-ленты со всеми новостями"""
+    response = client.get(feed_atom_url)
+    assert response['Content-Type'] == 'application/atom+xml; charset=utf-8'
+    feed = ElementTree.fromstring(read_stream(response))
+    namespace = {'atom': 'http://www.w3.org/2005/Atom'}
+    entries = feed.findall('atom:entry', namespace)
+    assert len(entries) == len(news_on_home_page)
+    assert {
+        entry.find('atom:title', namespace).text for entry in entries
+    } == {news.title for news in news_on_home_page}
+    assert feed.get('{http://www.w3.org/XML/1998/namespace}base') == (
+        'http://testserver/'
+    )
+
+
+@pytest.mark.urls('yanews.asgi_urls')
+@pytest.mark.parametrize('url', (
+    lf('feed_atom_url'),
+    lf('feed_json_url'),
+))
+def test_async_feeds_match_sync(client, async_client, async_get, order_news,
+                                url, settings):
+    """Тест того, что под ASGI ленты отдаются асинхронным потоком
+    с тем же содержимым, что и под WSGI
+    """
+    settings.NEWS_FEED_CHUNK_SIZE = 3
+    settings.NEWS_FEED_PAGE_SIZE = 4
+    pages = {}
+    while url:
+        response = async_get(async_client, url)
+        assert response.is_async
+        pages[url] = async_to_sync(aread_stream)(response)
+        url = json.loads(pages[url])['next'] if 'json' in url else None
+    settings.ROOT_URLCONF = 'yanews.urls'
+    for url, content in pages.items():
+        response = client.get(url)
+        assert not response.is_async
+        # Время обновления пустой ленты — текущее, его не сравниваем.
+        assert without_updated(read_stream(response)) == (
+            without_updated(content)
+        )
+
+
+def month_counts():
+    return {
+        (row.year, row.month): row.count
+        for row in NewsMonthCount.objects.all()
+    }
+
+
+def test_month_counts_follow_news_changes(news):
+    """Тест обновления счётчиков архива при добавлении, переносе
+    в другой месяц и удалении новостей
+    """
+    this_month = (news.date.year, news.date.month)
+    News.objects.create(title='Старая', text='Текст', date=date(2020, 1, 5))
+    News.objects.create(title='Старая', text='Текст', date=date(2020, 1, 9))
+    assert month_counts() == {this_month: 1, (2020, 1): 2}
+
+    moved = News.objects.filter(date__year=2020).first()
+    moved.date = date(2020, 2, 1)
+    moved.save()
+    assert month_counts() == {this_month: 1, (2020, 1): 1, (2020, 2): 1}
+
+    moved.delete()
+    assert month_counts() == {this_month: 1, (2020, 1): 1}
+
+
+def test_month_counts_skip_same_month(news, django_assert_num_queries):
+    """Тест того, что счётчики не пересчитываются, если новость
+    осталась в том же месяце
+    """
+    news = News.objects.get(pk=news.pk)
+    news.title = 'Новый заголовок'
+    # Только обновление самой новости.
+    with django_assert_num_queries(1):
+        news.save()
+    news.date = news.date.replace(day=1 if news.date.day > 1 else 2)
+    with django_assert_num_queries(1):
+        news.save()
+    assert month_counts() == {(news.date.year, news.date.month): 1}
+
+
+def test_archive_month_is_paginated(client, django_assert_num_queries):
+    """Тест страниц архива за месяц: только новости месяца, от новых
+    к старым, без подсчёта строк и группировки таблицы новостей
+    """
+    News.objects.bulk_create(
+        News(title=f'Новость {day}', text='Текст', date=date(2020, 3, day))
+        for day in range(1, 26)
+    )
+    News.objects.create(title='Апрель', text='Текст', date=date(2020, 4, 1))
+    NewsMonthCount.objects.refresh({(2020, 3)})
+    url = reverse('news:archive_month', args=(2020, 3))
+
+    # Счётчики месяцев и сами новости.
+    with django_assert_num_queries(2):
+        response = client.get(url)
+    page = response.context['object_list']
+    assert [news.date.day for news in page] == list(range(25, 5, -1))
+    assert response.context['paginator'].num_pages == 2
+    assert [
+        (month.year, month.month, month.count)
+        for month in response.context['months']
+    ] == [(2020, 4, 1), (2020, 3, 25)]
+
+    response = client.get(url, {'page': 2})
+    assert [news.date.day for news in response.context['object_list']] == [
+        5, 4, 3, 2, 1
+    ]
+
+
+def test_archive_page_size_follows_settings(client, news, settings):
+    """Тест того, что размер страницы архива читается из настроек"""
+    settings.NEWS_ARCHIVE_PAGE_SIZE = 1
+    News.objects.create(title='Другая', text='Текст', date=news.date)
+    response = client.get(
+        reverse('news:archive_year', args=(news.date.year,))
+    )
+    assert len(response.context['object_list']) == 1
+    assert response.context['paginator'].num_pages == 2
+
+
+def test_archive_year_lists_year_news(client, news):
+    """Тест страницы архива за год"""
+    News.objects.create(title='Другой год', text='Текст',
+                        date=date(2020, 1, 1))
+    response = client.get(reverse('news:archive_year', args=(2020,)))
+    assert [item.title for item in response.context['object_list']] == [
+        'Другой год'
+    ]
@@ -1,6 +1,31 @@
+import json
+import os
+import pstats
+import re
+import runpy
+import shutil
+import sqlite3
+import time
 from http import HTTPStatus
+from io import StringIO
 
-from news.models import Comment
+import pytest
+from asgiref.sync import SyncToAsync, async_to_sync
+from django.core.cache import cache
+from django.core.handlers.base import BaseHandler
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from pytest_lazy_fixtures import lf
+
+from news.models import Comment, News, NewsMonthCount, make_excerpt
+from news import search
+from news.moderation import find_bad_word
+from yanews.middleware import PROFILE_ID_HEADER, QueryBudgetExceeded
+from yanews import settings as project_settings
+from yanews.routers import REPLICA, mark_replica_synced, replica_synced_at
 
 
 def test_anonymous_user_cant_create_comment(client, news, news_detail_url,
@@ -34,6 +59,20 @@ def test_user_can_create_comment(author_client, news, news_detail_url,
     assert comment.author == author
 
 
+@pytest.mark.urls('yanews.asgi_urls')
+def test_user_can_create_comment_under_asgi(author_async_client, news,
+                                            news_detail_url, comment_data):
+    """Тест отправки комментария через асинхронный диспетчер страницы
+    новости
+    """
+    response = async_to_sync(author_async_client.post)(
+        news_detail_url, data=comment_data
+    )
+    assert response.status_code == HTTPStatus.FOUND
+    assert response.url == f'{news_detail_url}#comments'
+    assert Comment.objects.get().text == comment_data['text']
+
+
 def test_user_cant_use_bad_words(author_client, news, news_detail_url,
                                  bad_words_data):
     """Тест невозможности отправки комментария с плохим словом"""
@@ -47,6 +86,34 @@ def test_user_cant_use_bad_words(author_client, news, news_detail_url,
     assert comment_count == comment_count_before
 
 
+def test_bad_words_are_taken_from_settings(author_client, news_detail_url,
+                                           settings):
+    """Тест того, что список плохих слов берётся из настроек
+    и подхватывается при его изменении
+    """
+    settings.BAD_WORDS = ['бяка']
+
+    response = author_client.post(news_detail_url, data={'text': 'Ты БЯКА!'})
+    assert response.status_code == HTTPStatus.OK
+    assert response.context['form'].errors
+    assert Comment.objects.count() == 0
+
+
+@pytest.mark.parametrize('text,expected', (
+    ('Без ругательств', None),
+    ('Прямо РЕДИСКА какая-то', 'ред'),
+    ('дурачок', 'дура'),
+    ('a.b и x]', 'a.b'),
+    ('ab', None),
+))
+def test_find_bad_word(settings, text, expected):
+    """Тест поиска плохих слов, в том числе вложенных друг в друга
+    и содержащих спецсимволы регулярных выражений
+    """
+    settings.BAD_WORDS = ['редиска', 'ред', 'дура', 'a.b', 'x]']
+    assert find_bad_word(text) == expected
+
+
 def test_author_can_edit_own_comment(author_client, comment, edit_comment_url,
                                      edit_data):
     """Тест возможности редактировать собственный комментарий
@@ -106,3 +173,422 @@ def test_author_cannot_delete_other_comment(other_client, comment,
     final_count = Comment.objects.count()
     assert final_count == initial_count
     assert Comment.objects.filter(id=comment.id).exists()
+
+
+@pytest.mark.parametrize('url,data', (
+    (lf('news_detail_url'), lf('comment_data')),
+    (lf('edit_comment_url'), lf('edit_data')),
+    (lf('delete_comment_url'), {}),
+))
+def test_comment_write_query_count(author_client, news_detail_url, url, data,
+                                   django_assert_num_queries):
+    """Тест минимального числа запросов при создании, редактировании
+    и удалении комментария: сессия, пользователь, объект и запись
+    """
+    with django_assert_num_queries(4):
+        response = author_client.post(url, data=data)
+    assert response.status_code == HTTPStatus.FOUND
+    assert response.url == f'{news_detail_url}#comments'
+
+
+@pytest.mark.parametrize('url', (
+    lf('edit_comment_url'),
+    lf('delete_comment_url'),
+))
+def test_comment_page_query_count(author_client, url,
+                                  django_assert_num_queries):
+    """Тест того, что страницы редактирования и удаления загружают
+    комментарий вместе с новостью одним запросом
+    """
+    with django_assert_num_queries(3):
+        response = author_client.get(url)
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_query_budget_exceeded_raises(client, home_url, settings):
+    """Тест исключения при превышении бюджета запросов в тестах"""
+    settings.QUERY_BUDGETS = {'news:home': 0}
+    with pytest.raises(QueryBudgetExceeded):
+        client.get(home_url)
+
+
+def test_query_budget_exceeded_is_logged(client, home_url, settings, caplog):
+    """Тест записи в лог превышения бюджета запросов вне тестов"""
+    settings.QUERY_BUDGETS = {'news:home': 0}
+    settings.QUERY_BUDGET_RAISE = False
+
+    response = client.get(home_url)
+    assert response.status_code == HTTPStatus.OK
+    assert 'news:home' in caplog.text
+
+
+def test_profiling_saves_profile(client, news_detail_url, settings, tmp_path):
+    """Тест сохранения профиля запроса с заголовком профилирования"""
+    settings.PROFILING = True
+    settings.PROFILING_DIR = tmp_path
+
+    response = client.get(
+        news_detail_url, headers={settings.PROFILING_HEADER: '1'}
+    )
+    name = response[PROFILE_ID_HEADER]
+    report = json.loads(
+        (tmp_path / f'{name}.json').read_text(encoding='utf-8')
+    )
+    assert report['view_name'] == 'news:detail'
+    assert report['status'] == HTTPStatus.OK
+    assert report['template_duration'] > 0
+    assert report['query_count'] == len(report['queries']) > 0
+    assert any(
+        'news/views.py' in frame
+        for query in report['queries'] for frame in query['stack']
+    )
+    assert pstats.Stats(str(tmp_path / f'{name}.prof')).total_calls > 0
+
+
+@pytest.mark.parametrize(
+    'headers, sample_rate',
+    (({}, 1), ({'X-Profile': '1'}, 0)),
+)
+def test_profiling_is_opt_in(client, home_url, settings, tmp_path, headers,
+                             sample_rate):
+    """Тест того, что без заголовка или вне выборки запрос
+    не профилируется
+    """
+    settings.PROFILING = True
+    settings.PROFILING_DIR = tmp_path
+    settings.PROFILING_SAMPLE_RATE = sample_rate
+
+    response = client.get(home_url, headers=headers)
+    assert PROFILE_ID_HEADER not in response
+    assert not any(tmp_path.iterdir())
+
+
+def test_profiling_is_internal_only(client, home_url, settings, tmp_path):
+    """Тест того, что запросы с внешних адресов не профилируются"""
+    settings.PROFILING = True
+    settings.PROFILING_DIR = tmp_path
+
+    response = client.get(
+        home_url, headers={settings.PROFILING_HEADER: '1'},
+        REMOTE_ADDR='203.0.113.1'
+    )
+    assert PROFILE_ID_HEADER not in response
+    assert not any(tmp_path.iterdir())
+
+
+def test_profiling_keeps_latest_profiles(client, home_url, settings,
+                                         tmp_path):
+    """Тест удаления старых профилей сверх PROFILING_MAX_PROFILES"""
+    settings.PROFILING = True
+    settings.PROFILING_DIR = tmp_path
+    settings.PROFILING_MAX_PROFILES = 2
+
+    names = [
+        client.get(
+            home_url, headers={settings.PROFILING_HEADER: '1'}
+        )[PROFILE_ID_HEADER]
+        for _ in range(3)
+    ]
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+        f'{name}{suffix}' for name in names[1:]
+        for suffix in ('.json', '.prof')
+    )
+
+
+@pytest.mark.urls('yanews.asgi_urls')
+def test_profiling_under_asgi(async_client, async_get, news_detail_url,
+                              settings, tmp_path):
+    """Тест профилирования асинхронного представления"""
+    settings.PROFILING = True
+    settings.PROFILING_DIR = tmp_path
+
+    response = async_get(
+        async_client, news_detail_url,
+        headers={settings.PROFILING_HEADER: '1'}
+    )
+    report = json.loads((
+        tmp_path / f'{response[PROFILE_ID_HEADER]}.json'
+    ).read_text(encoding='utf-8'))
+    assert report['view_name'] == 'news:detail'
+    assert report['query_count'] > 0
+
+
+def test_middleware_chain_is_async():
+    """Тест того, что под ASGI цепочка middleware не уходит в поток"""
+    handler = BaseHandler()
+    handler.load_middleware(is_async=True)
+    assert not isinstance(handler._middleware_chain, SyncToAsync)
+
+
+def test_metrics_collect_requests(client, home_url, metrics_url,
+                                  metrics_store):
+    """Тест метрик времени, запросов к базе, кеша и статусов ответов"""
+    client.get(home_url)
+    client.get(home_url)
+    client.get('/missing/')
+
+    response = client.get(metrics_url)
+    assert response.status_code == HTTPStatus.OK
+    text = response.content.decode()
+    for line in (
+        'yanews_request_duration_seconds_count'
+        '{view="news:home",method="GET"} 2',
+        'yanews_request_queries_count{view="news:home"} 2',
+        'yanews_response_size_bytes_count{view="news:home"} 2',
+        'yanews_responses_total{view="news:home",status="2xx"} 2',
+        'yanews_responses_total{view="<unresolved>",status="4xx"} 1',
+        'yanews_cache_requests_total{view="news:home",result="hit"} 1',
+        'yanews_cache_requests_total{view="news:home",result="miss"} 1',
+    ):
+        assert line in text
+
+
+def test_metrics_are_summed_across_processes(client, home_url, metrics_url,
+                                             metrics_store, tmp_path):
+    """Тест сложения метрик из файлов других процессов"""
+    client.get(home_url)
+    metrics_store.flush(force=True)
+    # Файл другого воркера с такими же значениями.
+    shutil.copy(tmp_path / f'{os.getpid()}.json', tmp_path / '1.json')
+
+    text = client.get(metrics_url).content.decode()
+    assert (
+        'yanews_responses_total{view="news:home",status="2xx"} 2' in text
+    )
+
+
+def test_metrics_hidden_from_external_addresses(client, metrics_url):
+    """Тест недоступности метрик с адресов не из INTERNAL_IPS"""
+    response = client.get(metrics_url, REMOTE_ADDR='10.0.0.1')
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_archive_export_import_roundtrip(comments, tmp_path):
+    """Тест выгрузки и загрузки архива новостей и комментариев без
+    потери данных, включая время создания комментариев
+    """
+    def dump():
+        return (
+            list(News.objects.order_by('pk').values()),
+            list(Comment.objects.order_by('pk').values()),
+        )
+
+    expected = dump()
+    month_counts = list(NewsMonthCount.objects.values())
+    archive = tmp_path / 'archive.ndjson'
+    call_command('news_archive', 'export', str(archive), stdout=StringIO())
+    assert len(archive.read_text().splitlines()) == 1 + len(comments)
+
+    News.objects.all().delete()
+    assert not NewsMonthCount.objects.exists()
+    call_command('news_archive', 'import', str(archive), stdout=StringIO())
+    assert dump() == expected
+    assert list(NewsMonthCount.objects.values('year', 'month', 'count')) == [
+        {key: row[key] for key in ('year', 'month', 'count')}
+        for row in month_counts
+    ]
+
+
+def test_archive_import_in_batches(news, comments, tmp_path):
+    """Тест загрузки архива пачками: одна вставка на модель в пачке"""
+    archive = tmp_path / 'archive.ndjson'
+    call_command('news_archive', 'export', str(archive), stdout=StringIO())
+    News.objects.all().delete()
+
+    with CaptureQueriesContext(connection) as queries:
+        call_command('news_archive', 'import', str(archive),
+                     '--batch-size', '4', stdout=StringIO())
+
+    # Счётчик архива обновляется отдельным запросом.
+    inserts = [
+        query for query in queries if query['sql'].startswith('INSERT')
+        and 'news_newsmonthcount' not in query['sql']
+    ]
+    # 11 объектов по 4 в пачке: в первой пачке новость и комментарии.
+    assert len(inserts) == 4
+    assert Comment.objects.count() == len(comments)
+
+
+def test_rebuild_search_index(news):
+    """Тест восстановления поискового индекса командой"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {search.TABLE}({search.TABLE}) VALUES ('delete-all')"
+        )
+    assert not search.search_news('новость').exists()
+
+    call_command('rebuild_search_index', stdout=StringIO())
+
+    assert list(search.search_news('новость')) == [news]
+
+
+def set_replica_synced(replica, started):
+    """Отметка о копировании, как её пишет sync_replica."""
+    target = sqlite3.connect(replica.settings_dict['NAME'])
+    try:
+        mark_replica_synced(target, started)
+    finally:
+        target.close()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_news_pages_read_from_replica(author_client, replica, news,
+                                      news_detail_url, comment_data,
+                                      settings):
+    """Тест чтения страницы новости из реплики и чтения из основной
+    базы, пока реплика может не успеть за изменением
+    """
+    settings.REPLICA_LAG = 0
+    # Реплика ни разу не обновлялась: её файла нет, читаем из основной.
+    assert author_client.get(news_detail_url).status_code == HTTPStatus.OK
+
+    call_command('sync_replica', stdout=StringIO())
+    author_client.post(news_detail_url, data=comment_data)
+    # Реплику не обновили после комментария.
+    assert author_client.get(news_detail_url).context['comments']
+
+    # Реплику обновили, но изменение моложе допустимого отставания.
+    call_command('sync_replica', stdout=StringIO())
+    settings.REPLICA_LAG = 60
+    assert author_client.get(news_detail_url).context['comments']
+
+    # Реплика отстаёт: страница из неё ещё без нового комментария.
+    settings.REPLICA_LAG = 0
+    author_client.post(news_detail_url, data=comment_data)
+    synced_at = replica_synced_at()
+    set_replica_synced(replica, time.time_ns())
+    assert len(author_client.get(news_detail_url).context['comments']) == 1
+    set_replica_synced(replica, synced_at)
+    assert len(author_client.get(news_detail_url).context['comments']) == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_replica_sync_time_is_shared(replica, news):
+    """Тест того, что время копирования хранится в реплике, а не в кеше
+    процесса: sync_replica запускается отдельным процессом
+    """
+    assert replica_synced_at() is None
+    started = time.time_ns()
+    call_command('sync_replica', stdout=StringIO())
+    cache.clear()
+    synced_at = replica_synced_at()
+    assert started < synced_at < time.time_ns()
+
+
+def test_replica_is_not_configured_by_default(settings):
+    """Тест того, что без YANEWS_REPLICA_DB реплика не настроена"""
+    assert REPLICA not in settings.DATABASES
+
+
+def test_sqlite_profile_is_applied(settings):
+    """Тест применения профиля SQLite к соединению"""
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA synchronous')
+        assert cursor.fetchone()[0] == 1
+        cursor.execute('PRAGMA cache_size')
+        assert cursor.fetchone()[0] == int(
+            settings.SQLITE_PRAGMAS['cache_size']
+        )
+    assert connection.transaction_mode == 'IMMEDIATE'
+
+
+@pytest.mark.parametrize('async_views, conn_max_age', (
+    ('0', 60),
+    ('1', 0),
+))
+def test_persistent_connections_default(monkeypatch, async_views,
+                                        conn_max_age):
+    """Тест того, что под ASGI постоянные соединения выключены"""
+    monkeypatch.setenv('YANEWS_ASYNC_VIEWS', async_views)
+    monkeypatch.delenv('YANEWS_CONN_MAX_AGE', raising=False)
+    values = runpy.run_path(project_settings.__file__)
+    assert values['DATABASES']['default']['CONN_MAX_AGE'] == conn_max_age
+
+
+@pytest.mark.parametrize('engine, timeout, queries', (
+    ('django.contrib.sessions.backends.db', None, 4),
+    ('django.contrib.sessions.backends.cached_db', 60, 2),
+    ('django.contrib.sessions.backends.signed_cookies', 60, 2),
+))
+def test_session_modes_query_count(author, news_detail_url, settings,
+                                   engine, timeout, queries,
+                                   django_assert_num_queries):
+    """Тест того, что в режимах cache и cookies сессия и пользователь
+    не читаются из базы
+    """
+    settings.SESSION_ENGINE = engine
+    settings.USER_CACHE_TIMEOUT = timeout
+    client = Client()
+    client.force_login(author)
+    client.get(news_detail_url)
+
+    with django_assert_num_queries(queries):
+        response = client.get(news_detail_url)
+    assert response.context['user'] == author
+
+
+def test_cached_user_is_invalidated(author, author_client, news_detail_url,
+                                    settings):
+    """Тест сброса закешированного пользователя при его изменении"""
+    settings.USER_CACHE_TIMEOUT = 60
+    author_client.get(news_detail_url)
+    author.username = 'Новое имя'
+    author.save()
+    assert 'Новое имя' in author_client.get(news_detail_url).content.decode()
+
+    author.set_password('new-password')
+    author.save()
+    # Сброс недействительной сессии не укладывается в бюджет страницы.
+    settings.QUERY_BUDGET_RAISE = False
+    response = author_client.get(news_detail_url)
+    assert not response.context['user'].is_authenticated
+
+
+def csrf_token(response):
+    return re.search(
+        r'name="csrfmiddlewaretoken" value="([^"]+)"',
+        response.content.decode()
+    )[1]
+
+
+def test_page_after_relogin_is_not_stale(author, login_url, news,
+                                         news_detail_url, comment_data):
+    """Тест того, что после повторного входа страница новости не
+    отдаётся ответом 304 со старым CSRF-токеном
+    """
+    author.set_password('password')
+    author.save()
+    client = Client(enforce_csrf_checks=True)
+
+    def login():
+        response = client.post(login_url, {
+            'username': author.username,
+            'password': 'password',
+            'csrfmiddlewaretoken': csrf_token(client.get(login_url)),
+        })
+        assert response.status_code == HTTPStatus.FOUND
+
+    login()
+    response = client.get(news_detail_url)
+    etag = response['ETag']
+    client.post(reverse('users:logout'), {
+        'csrfmiddlewaretoken': csrf_token(response)
+    })
+    login()
+    response = client.get(news_detail_url, headers={'If-None-Match': etag})
+    assert response.status_code == HTTPStatus.OK
+    response = client.post(news_detail_url, {
+        **comment_data, 'csrfmiddlewaretoken': csrf_token(response)
+    })
+    assert response.status_code == HTTPStatus.FOUND
+    assert Comment.objects.filter(news=news, author=author).exists()
+
+
+def test_fixture_news_get_excerpts(db):
+    """Тест начала текста у новостей, загруженных из фикстуры"""
+    call_command('loaddata', 'news', stdout=StringIO())
+    news_list = list(News.objects.all())
+    assert news_list
+    for news in news_list:
+        assert news.excerpt
+        assert news.excerpt == make_excerpt(news.text)
@@ -1,6 +1,7 @@
 from http import HTTPStatus
 
 import pytest
+from django.urls import reverse
 from pytest_django.asserts import assertRedirects
 from pytest_lazy_fixtures import lf
 
@@ -8,10 +9,22 @@ from pytest_lazy_fixtures import lf
 COMMON_PAGES = [
     (lf('home_url'), 'get', HTTPStatus.OK),
     (lf('news_detail_url'), 'get', HTTPStatus.OK),
+    (lf('news_comments_url'), 'get', HTTPStatus.OK),
+    (lf('search_url'), 'get', HTTPStatus.OK),
+    (lf('archive_url'), 'get', HTTPStatus.OK),
+    (lf('feed_atom_url'), 'get', HTTPStatus.OK),
+    (lf('feed_json_url'), 'get', HTTPStatus.OK),
     (lf('login_url'), 'get', HTTPStatus.OK),
     (lf('signup_url'), 'get', HTTPStatus.OK),
 ]
 
+ADMIN_PAGES = [
+    lf('admin_news_url'),
+    lf('admin_comments_url'),
+    reverse('admin:news_news_changelist'),
+    reverse('admin:news_news_changelist') + '?q=Тестовая',
+]
+
 COMMENT_ACTIONS = [
     (lf('edit_comment_url'), 'get'),
     (lf('delete_comment_url'), 'get'),
@@ -25,6 +38,13 @@ def test_common_pages_status(client, url, method, expected):
     assert response.status_code == expected
 
 
+@pytest.mark.parametrize("url", ADMIN_PAGES)
+def test_admin_pages_status(admin_client, comment, url):
+    """Тест доступности страниц админки новостей и комментариев."""
+    response = admin_client.get(url)
+    assert response.status_code == HTTPStatus.OK
+
+
 @pytest.mark.parametrize("url,method", COMMENT_ACTIONS)
 def test_comment_action_status_author(author_client, url, method):
     """Тест доступа автора к редактированию и удалению комментария."""
@@ -47,3 +67,43 @@ def test_comment_action_redirect_anonymous(client, login_url, url, method):
     expected_redirect = f"{login_url}?next={url}"
     response = getattr(client, method)(url)
     assertRedirects(response, expected_redirect)
+
+
+@pytest.mark.parametrize('cursor', ('abc', '99999999999999999999_1'))
+def test_comments_page_bad_cursor(client, news_comments_url, cursor):
+    """Тест ответа 400 на некорректный курсор комментариев."""
+    response = client.get(news_comments_url, {'after': cursor})
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_comments_page_missing_news(client):
+    """Тест ответа 404 для комментариев несуществующей новости."""
+    response = client.get(reverse('news:comments', args=(0,)))
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_search_page_out_of_range(client, news, search_url):
+    """Тест ответа 404 на несуществующую страницу результатов поиска."""
+    response = client.get(search_url, {'q': 'Текст', 'page': 2})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.parametrize(
+    'params',
+    ({'cursor': 'abc'}, {'limit': 'abc'}, {'limit': 0}, {'limit': 10 ** 6}),
+)
+def test_json_feed_bad_params(client, feed_json_url, params):
+    """Тест ответа 400 на некорректный курсор или размер страницы ленты."""
+    response = client.get(feed_json_url, params)
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.parametrize('args', (
+    (2000,), (2000, 1), (2000, 13),
+    (0,), (9999,), (9999, 12), (99999, 1),
+))
+def test_archive_missing_period(client, news, args):
+    """Тест ответа 404 для периода архива без новостей."""
+    name = 'news:archive_year' if len(args) == 1 else 'news:archive_month'
+    response = client.get(reverse(name, args=args))
+    assert response.status_code == HTTPStatus.NOT_FOUND
@@ -0,0 +1,163 @@
+"""
+Полнотекстовый поиск по новостям.
+
+На SQLite используется виртуальная таблица FTS5 с внешним содержимым:
+сам текст хранится только в news_news, а индекс обновляют триггеры,
+поэтому он не расходится с таблицей и при bulk_create, и при
+изменениях в обход ORM. На других СУБД поиск сводится к icontains.
+"""
+import re
+
+from django.db import connection
+from django.db.models import F, Func, Lookup, Q, TextField, Value
+from django.db.models.functions import Left
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import News, NewsSearchIndex
+
+TABLE = NewsSearchIndex._meta.db_table
+
+# Служебные символы вокруг найденных слов: текст новости экранируется
+# целиком, и лишь затем они заменяются на <mark>.
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+SNIPPET_TOKENS = 24
+
+CREATE_INDEX = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE}
+    USING fts5(title, text, content='news_news', content_rowid='id')
+    """,
+    # Совпадение в заголовке весит больше, чем в тексте.
+    f"INSERT INTO {TABLE}({TABLE}, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_insert AFTER INSERT ON news_news
+    BEGIN
+        INSERT INTO {TABLE}(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_delete AFTER DELETE ON news_news
+    BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_update
+    AFTER UPDATE OF title, text ON news_news
+    BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+        INSERT INTO {TABLE}(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+    f"INSERT INTO {TABLE}({TABLE}) VALUES ('rebuild')",
+)
+
+DROP_INDEX = (
+    f'DROP TRIGGER IF EXISTS {TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {TABLE}_delete',
+    f'DROP TRIGGER IF EXISTS {TABLE}_update',
+    f'DROP TABLE IF EXISTS {TABLE}',
+)
+
+
+def create_index(connection):
+    """
+    Создаёт индекс и триггеры и заполняет индекс по news_news.
+
+    Вызывается командой rebuild_search_index. Миграции держат свою
+    копию этого SQL: SQLite удаляет триггеры вместе с таблицей, когда
+    Django пересоздаёт её при изменении схемы.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for sql in CREATE_INDEX:
+            cursor.execute(sql)
+
+
+def drop_index(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for sql in DROP_INDEX:
+            cursor.execute(sql)
+
+
+def match_expression(query):
+    """
+    Выражение MATCH из строки поиска.
+
+    Каждое слово становится отдельной фразой с поиском по префиксу,
+    поэтому операторы FTS5 в пользовательском вводе не действуют.
+    """
+    return ' '.join(f'"{term}"*' for term in re.findall(r'\w+', query))
+
+
+class Match(Lookup):
+    """Условие MATCH по индексу FTS5."""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', (*lhs_params, *rhs_params)
+
+
+NewsSearchIndex._meta.get_field('document').register_lookup(Match)
+
+
+class IndexFunction(Func):
+    """Вспомогательная функция FTS5 вроде highlight() или snippet()."""
+    output_field = TextField()
+
+    def __init__(self, function, *arguments):
+        super().__init__(
+            F('search_index__document'),
+            *(Value(argument) for argument in arguments),
+            function=function,
+        )
+
+
+def search_news(query):
+    """
+    Новости, подходящие под запрос, от более релевантных к менее.
+
+    У каждой новости есть title_highlight и snippet — заголовок
+    и фрагмент текста с отмеченными совпадениями, см. highlight().
+    """
+    expression = match_expression(query)
+    if not expression:
+        return News.objects.none()
+    if connection.vendor != 'sqlite':
+        condition = Q()
+        for term in re.findall(r'\w+', query):
+            condition &= Q(title__icontains=term) | Q(text__icontains=term)
+        return News.objects.filter(condition).annotate(
+            title_highlight=F('title'), snippet=Left('text', 200)
+        )
+    # Индекс соединяется с новостями по rowid, и функции FTS5
+    # вычисляются в том же запросе, где выполняется MATCH.
+    return News.objects.filter(
+        search_index__document__match=expression
+    ).annotate(
+        title_highlight=IndexFunction('highlight', 0, MARK_START, MARK_END),
+        snippet=IndexFunction(
+            'snippet', 1, MARK_START, MARK_END, '…', SNIPPET_TOKENS
+        ),
+    ).order_by('search_index__rank')
+
+
+def highlight(value):
+    """Экранирует текст и выделяет совпадения тегом <mark>."""
+    return mark_safe(
+        escape(value).replace(MARK_START, '<mark>').replace(
+            MARK_END, '</mark>'
+        )
+    )
@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .backends import user_key
+from .cache import (
+    FEED_FORMATS, HOME, bump_generations, feed_item_key, news_key
+)
+from .models import Comment, News, NewsMonthCount, make_excerpt, month_of
+
+
+@receiver(pre_save, sender=News)
+def fill_excerpt(sender, instance, update_fields=None, **kwargs):
+    """
+    Обновляет начало текста новости.
+
+    Сигнал отправляется и при загрузке фикстур (raw), которая обходит
+    News.save().
+    """
+    if update_fields is None or 'text' in update_fields:
+        instance.excerpt = make_excerpt(instance.text)
+
+
+@receiver((post_save, post_delete), sender=News)
+def invalidate_news(sender, instance, **kwargs):
+    """Сбрасывает кеш страниц с новостью и её записи в лентах."""
+    bump_generations(HOME, news_key(instance.pk))
+    cache.delete_many(
+        [feed_item_key(feed_format, instance.pk)
+         for feed_format in FEED_FORMATS]
+    )
+
+
+@receiver(post_save, sender=News)
+def update_month_counts(sender, instance, **kwargs):
+    """
+    Новость могла появиться в месяце или перейти в другой.
+
+    Если дата не менялась или осталась в том же месяце, счётчики
+    верны и пересчёт не нужен.
+    """
+    loaded_date = getattr(instance, '_loaded_date', None)
+    instance._loaded_date = instance.date
+    if loaded_date is None:
+        NewsMonthCount.objects.refresh({month_of(instance.date)})
+    elif month_of(loaded_date) != month_of(instance.date):
+        NewsMonthCount.objects.refresh(
+            {month_of(loaded_date), month_of(instance.date)}
+        )
+
+
+@receiver(post_delete, sender=News)
+def update_month_count(sender, instance, **kwargs):
+    NewsMonthCount.objects.refresh({month_of(instance.date)})
+
+
+@receiver((post_save, post_delete), sender=Comment)
+def invalidate_comment(sender, instance, **kwargs):
+    """Комментарии выводятся на странице новости и считаются на главной."""
+    bump_generations(HOME, news_key(instance.news_id))
+
+
+@receiver((post_save, post_delete), sender=settings.AUTH_USER_MODEL)
+def invalidate_user(sender, instance, **kwargs):
+    """Пользователь сессии закеширован, см. CachedModelBackend."""
+    cache.delete(user_key(instance.pk))
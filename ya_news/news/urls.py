@@ -7,6 +7,25 @@ app_name = 'news'
 urlpatterns = [
     path('', views.NewsList.as_view(), name='home'),
     path('news/<int:pk>/', views.NewsDetailView.as_view(), name='detail'),
+    path(
+        'news/<int:pk>/comments/',
+        views.NewsComments.as_view(),
+        name='comments'
+    ),
+    path('search/', views.NewsSearch.as_view(), name='search'),
+    path('archive/', views.NewsArchive.as_view(), name='archive'),
+    path(
+        'archive/<int:year>/',
+        views.NewsYearArchive.as_view(),
+        name='archive_year'
+    ),
+    path(
+        'archive/<int:year>/<int:month>/',
+        views.NewsMonthArchive.as_view(),
+        name='archive_month'
+    ),
+    path('feed/atom/', views.NewsAtomFeed.as_view(), name='feed_atom'),
+    path('feed/json/', views.NewsJsonFeed.as_view(), name='feed_json'),
     path(
         'delete_comment/<int:pk>/',
         views.CommentDelete.as_view(),
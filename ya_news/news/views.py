@@ -1,39 +1,138 @@
+from datetime import MAXYEAR, MINYEAR, date
+
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import get_object_or_404
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.template.response import SimpleTemplateResponse
 from django.urls import reverse
+from django.utils.functional import cached_property
+from django.utils.cache import get_conditional_response
 from django.views import generic
 
+from yanews.metrics import CACHE_HEADER
+from yanews.routers import replica_reads, replica_synced_at
+
+from .cache import (
+    HOME, get_generation, news_key, page_etag, page_key, set_etag
+)
+from .feeds import atom_feed, json_feed
 from .forms import CommentForm
-from .models import Comment, News
+from .models import Comment, News, NewsMonthCount, month_bounds
+from .pagination import get_comment_page
+from .search import highlight, search_news
+
+
+def latest_news():
+    """
+    Последние новости с числом комментариев.
+
+    Их количество определяется в настройках проекта. Сами комментарии
+    и полный текст новостей не загружаются: на странице выводится
+    сохранённое начало текста.
+    """
+    return News.objects.with_comment_count().defer('text')[
+        :settings.NEWS_COUNT_ON_HOME_PAGE
+    ]
+
+
+class PageCacheMixin:
+    """
+    Кеширует страницу целиком для анонимных пользователей.
+
+    В ключ входит поколение, возвращаемое get_cache_generation(), поэтому
+    после изменения данных страница рендерится заново. Авторизованные
+    пользователи видят персональные элементы и получают свежий рендер.
+
+    Поколение служит и валидатором: на If-None-Match с прежним ETag
+    отвечаем 304, не загружая данные страницы.
+    Сами данные читаются из реплики, см. yanews.routers.
+    """
+
+    def get_cache_generation(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        generation = self.get_cache_generation()
+        etag = page_etag(generation, request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            with replica_reads(
+                request, generation, replica_synced_at()
+            ):
+                response = self.get_page(request, generation, *args, **kwargs)
+                # Ленивые выборки выполняются при рендере, поэтому
+                # шаблон рендерится, пока чтение идёт из реплики.
+                if isinstance(response, SimpleTemplateResponse):
+                    response.render()
+        # Рендер мог завести новый CSRF-секрет, и ETag должен
+        # соответствовать токену на странице.
+        return set_etag(response, page_etag(generation, request))
+
+    def get_page(self, request, generation, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+        key = page_key(request.get_full_path(), generation)
+        content = cache.get(key)
+        if content is not None:
+            return HttpResponse(content, headers={CACHE_HEADER: 'HIT'})
+        response = super().get(request, *args, **kwargs)
+        response[CACHE_HEADER] = 'MISS'
+        response.add_post_render_callback(
+            lambda response: cache.set(
+                key, response.content, settings.NEWS_CACHE_TIMEOUT
+            )
+        )
+        return response
 
 
-class NewsList(generic.ListView):
+class NewsList(PageCacheMixin, generic.ListView):
     """Список новостей."""
     model = News
     template_name = 'news/home.html'
 
-    def get_queryset(self):
-        """
-        Выводим только несколько последних новостей.
+    def get_cache_generation(self):
+        return get_generation(HOME)
 
-        Их количество определяется в настройках проекта.
+    def get_context_data(self, **kwargs):
         """
-        return self.model.objects.prefetch_related(
-            'comment_set'
-        )[:settings.NEWS_COUNT_ON_HOME_PAGE]
+        Список новостей не зависит от пользователя, поэтому для
+        авторизованных он кешируется фрагментом шаблона.
+        """
+        context = super().get_context_data(**kwargs)
+        context.update(
+            cache_generation=self.get_cache_generation(),
+            cache_timeout=settings.NEWS_CACHE_TIMEOUT,
+        )
+        return context
+
+    def get_queryset(self):
+        """Выводим только несколько последних новостей."""
+        return latest_news()
+
 
+class CommentPageMixin:
+    """Добавляет в контекст первую страницу комментариев к новости."""
 
-class NewsDetail(generic.DetailView):
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        comments, next_cursor = get_comment_page(self.object.pk)
+        context.update(
+            comments=comments, next_cursor=next_cursor, news_id=self.object.pk
+        )
+        return context
+
+
+class NewsDetail(PageCacheMixin, CommentPageMixin, generic.DetailView):
     model = News
     template_name = 'news/detail.html'
 
+    def get_cache_generation(self):
+        return get_generation(news_key(self.kwargs['pk']))
+
     def get_object(self, queryset=None):
-        obj = get_object_or_404(
-            self.model.objects.prefetch_related('comment_set__author'),
-            pk=self.kwargs['pk']
-        )
-        return obj
+        return get_object_or_404(self.model, pk=self.kwargs['pk'])
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -44,6 +143,7 @@ class NewsDetail(generic.DetailView):
 
 class NewsComment(
         LoginRequiredMixin,
+        CommentPageMixin,
         generic.detail.SingleObjectMixin,
         generic.FormView
 ):
@@ -63,8 +163,9 @@ class NewsComment(
         return super().form_valid(form)
 
     def get_success_url(self):
-        post = self.get_object()
-        return reverse('news:detail', kwargs={'pk': post.pk}) + '#comments'
+        return reverse(
+            'news:detail', kwargs={'pk': self.object.pk}
+        ) + '#comments'
 
 
 class NewsDetailView(generic.View):
@@ -78,19 +179,151 @@ class NewsDetailView(generic.View):
         return view(request, *args, **kwargs)
 
 
+class NewsComments(generic.View):
+    """Следующая страница комментариев в виде HTML-фрагмента."""
+
+    def get(self, request, pk):
+        if not News.objects.filter(pk=pk).exists():
+            raise Http404
+        comments, next_cursor = get_comment_page(pk, request.GET.get('after'))
+        return render(request, 'news/comments.html', {
+            'comments': comments,
+            'next_cursor': next_cursor,
+            'news_id': pk,
+        })
+
+
+class NewsSearch(generic.ListView):
+    """Полнотекстовый поиск по заголовкам и текстам новостей."""
+    template_name = 'news/search.html'
+
+    def get_paginate_by(self, queryset):
+        return settings.NEWS_SEARCH_RESULTS_ON_PAGE
+
+    def get_queryset(self):
+        self.query = self.request.GET.get('q', '').strip()
+        return search_news(self.query)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        results = list(context['object_list'])
+        for news in results:
+            news.title_highlight = highlight(news.title_highlight)
+            news.snippet = highlight(news.snippet)
+        context.update(
+            object_list=results, news_list=results, query=self.query
+        )
+        return context
+
+
+class ArchiveMixin(PageCacheMixin):
+    """
+    Страница архива с боковой панелью месяцев.
+
+    Число новостей за месяц берётся из NewsMonthCount, а не группировкой
+    таблицы новостей. Любое изменение новостей или комментариев сдвигает
+    поколение главной страницы, по нему кешируется и архив.
+    """
+    template_name = 'news/archive.html'
+
+    def get_cache_generation(self):
+        return get_generation(HOME)
+
+    @cached_property
+    def months(self):
+        return list(NewsMonthCount.objects.all())
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(months=self.months, **kwargs)
+
+
+class NewsArchive(ArchiveMixin, generic.TemplateView):
+    """Оглавление архива."""
+
+
+class NewsPeriodArchive(ArchiveMixin, generic.ListView):
+    """
+    Новости за период постранично, от новых к старым.
+
+    Период — год из адреса или месяц, если он тоже указан.
+    """
+
+    def get_paginate_by(self, queryset):
+        return settings.NEWS_ARCHIVE_PAGE_SIZE
+
+    def get_period(self):
+        """Первый день периода и первый день после него."""
+        year, month = self.kwargs['year'], self.kwargs.get('month')
+        # Конец периода — начало следующего года или месяца, поэтому
+        # последний допустимый год на единицу меньше MAXYEAR.
+        if not MINYEAR <= year < MAXYEAR or (
+            month is not None and not 1 <= month <= 12
+        ):
+            raise Http404
+        if month is None:
+            return date(year, 1, 1), date(year + 1, 1, 1)
+        return month_bounds(year, month)
+
+    def get_news_count(self):
+        """Число новостей за период по счётчикам месяцев."""
+        start, end = self.get_period()
+        return sum(
+            month.count for month in self.months
+            if start <= month.first_day < end
+        )
+
+    def get_queryset(self):
+        self.news_count = self.get_news_count()
+        if not self.news_count:
+            raise Http404
+        start, end = self.get_period()
+        return News.objects.with_comment_count().defer('text').filter(
+            date__gte=start, date__lt=end
+        ).order_by('-date', '-pk')
+
+    def get_paginator(self, *args, **kwargs):
+        paginator = super().get_paginator(*args, **kwargs)
+        # Число новостей уже известно, запрос COUNT не нужен.
+        paginator.count = self.news_count
+        return paginator
+
+
+class NewsYearArchive(NewsPeriodArchive):
+    """Новости за год."""
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(year=self.kwargs['year'], **kwargs)
+
+
+class NewsMonthArchive(NewsPeriodArchive):
+    """Новости за месяц."""
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(
+            month_start=self.get_period()[0], **kwargs
+        )
+
+
 class CommentBase(LoginRequiredMixin):
     """Базовый класс для работы с комментариями."""
     model = Comment
 
     def get_success_url(self):
-        comment = self.get_object()
+        """Комментарий уже загружен, новость для адреса не нужна."""
         return reverse(
-            'news:detail', kwargs={'pk': comment.news.pk}
+            'news:detail', kwargs={'pk': self.object.news_id}
         ) + '#comments'
 
     def get_queryset(self):
-        """Пользователь может работать только со своими комментариями."""
-        return self.model.objects.filter(author=self.request.user)
+        """
+        Пользователь может работать только со своими комментариями.
+
+        Заголовок новости выводится в шаблонах редактирования и удаления,
+        поэтому новость загружается тем же запросом.
+        """
+        return self.model.objects.filter(
+            author=self.request.user
+        ).select_related('news')
 
 
 class CommentUpdate(CommentBase, generic.UpdateView):
@@ -102,3 +335,32 @@ class CommentUpdate(CommentBase, generic.UpdateView):
 class CommentDelete(CommentBase, generic.DeleteView):
     """Удаление комментария."""
     template_name = 'news/delete.html'
+
+
+class NewsAtomFeed(generic.View):
+    """
+    Все новости в формате Atom, отдаются потоком.
+
+    Потоком лента отдаётся только под WSGI, под ASGI её обслуживает
+    AsyncNewsAtomFeed.
+    """
+
+    def get(self, request):
+        return StreamingHttpResponse(
+            atom_feed(request),
+            content_type='application/atom+xml; charset=utf-8',
+        )
+
+
+class NewsJsonFeed(generic.View):
+    """
+    Страница новостей в JSON, отдаётся потоком.
+
+    Потоком страница отдаётся только под WSGI, под ASGI её обслуживает
+    AsyncNewsJsonFeed.
+    """
+
+    def get(self, request):
+        return StreamingHttpResponse(
+            json_feed(request), content_type='application/json'
+        )
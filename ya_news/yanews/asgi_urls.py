@@ -0,0 +1,13 @@
+"""Корневые маршруты для запуска под ASGI, см. yanews.asgi."""
+from django.contrib import admin
+from django.urls import include, path
+
+from yanews.metrics import metrics
+from yanews.urls import auth_urls
+
+urlpatterns = [
+    path('', include('news.async_urls')),
+    path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
+    path('auth/', include(auth_urls)),
+]
@@ -0,0 +1,390 @@
+import cProfile
+import json
+import logging
+import pstats
+import random
+import threading
+import time
+import traceback
+from contextvars import ContextVar
+from pathlib import Path
+from uuid import uuid4
+
+from asgiref.sync import (
+    iscoroutinefunction, markcoroutinefunction, sync_to_async
+)
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.base import Template
+
+from .metrics import CACHE_HEADER, labels, store
+
+logger = logging.getLogger(__name__)
+
+# Статистика текущего запроса. Переменная контекста, а не атрибут
+# соединения, чтобы учитывать запросы из любого потока этого запроса.
+current_stats = ContextVar('current_stats', default=None)
+
+# Профиль текущего запроса, если запрос профилируется.
+current_profile = ContextVar('current_profile', default=None)
+
+# Два профилировщика cProfile не работают одновременно, к тому же
+# профилирование дорого: в процессе профилируется не больше одного
+# запроса за раз, остальные выполняются как обычно.
+profiling_lock = threading.Lock()
+
+PROFILE_ID_HEADER = 'X-Profile-Id'
+
+# Метки метрик для адресов, не совпавших ни с одним маршрутом,
+# и для нестандартных методов: иначе число рядов метрик росло бы
+# от случайных запросов.
+UNRESOLVED = '<unresolved>'
+
+METRICS_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+# Сколько SQL-запросов сохранять в профиле одного запроса.
+MAX_PROFILED_QUERIES = 1000
+
+
+class QueryBudgetExceeded(Exception):
+    """Представление выполнило больше SQL-запросов, чем разрешено."""
+
+
+class QueryStats:
+    """Число SQL-запросов и суммарное время работы БД."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+def call_site():
+    """Кадры кода проекта, из которых выполнен SQL-запрос, изнутри наружу."""
+    base_dir = str(settings.BASE_DIR)
+    return [
+        f'{Path(frame.filename).relative_to(base_dir)}:{frame.lineno} '
+        f'in {frame.name}'
+        for frame in traceback.StackSummary.extract(
+            traceback.walk_stack(None), lookup_lines=False
+        )
+        if frame.filename.startswith(base_dir)
+        and frame.filename != __file__
+        and 'site-packages' not in frame.filename
+    ]
+
+
+class RequestProfile:
+    """Статистика cProfile и SQL-запросы одного запроса."""
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.queries = []
+        self.started = None
+        self.duration = 0.0
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.duration = time.perf_counter() - self.started
+
+    def add_query(self, sql, duration):
+        if len(self.queries) < MAX_PROFILED_QUERIES:
+            self.queries.append({
+                'sql': sql,
+                'duration': round(duration, 6),
+                'stack': call_site(),
+            })
+
+    def template_duration(self):
+        """Время Template.render, включая вложенные шаблоны."""
+        code = Template.render.__code__
+        entry = pstats.Stats(self.profiler).stats.get(
+            (code.co_filename, code.co_firstlineno, code.co_name)
+        )
+        # Четвёртое значение — время с учётом вызванных функций.
+        return entry[3] if entry else 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current_stats.get()
+    profile = current_profile.get()
+    if stats is None and profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        if stats is not None:
+            stats.count += 1
+            stats.duration += duration
+        if profile is not None:
+            profile.add_query(sql, duration)
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+@receiver(connection_created)
+def connection_created_handler(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+@receiver(request_started)
+def request_started_handler(sender, **kwargs):
+    """
+    Соединения, открытые до подключения обработчика connection_created.
+
+    Под ASGI сигнал отправляется в том же потоке, где затем выполняются
+    запросы к базе, поэтому и там учёт работает.
+    """
+    for connection in connections.all(initialized_only=True):
+        install_query_recorder(connection)
+
+
+class QueryBudgetMiddleware:
+    """
+    Следит за бюджетом SQL-запросов представлений.
+
+    Бюджеты задаются в settings.QUERY_BUDGETS по имени маршрута: число
+    запросов или пара (число запросов, время работы БД в секундах).
+    Превышение пишется в лог, а при settings.QUERY_BUDGET_RAISE
+    приводит к исключению QueryBudgetExceeded — так бюджеты проверяются
+    в тестах.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.query_stats = stats = QueryStats()
+        token = current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        self.check_budget(request, stats)
+        return response
+
+    async def __acall__(self, request):
+        request.query_stats = stats = QueryStats()
+        token = current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        self.check_budget(request, stats)
+        return response
+
+    def check_budget(self, request, stats):
+        match = request.resolver_match
+        budget = match and settings.QUERY_BUDGETS.get(match.view_name)
+        if budget is None:
+            return
+        max_count, max_duration = (
+            budget if isinstance(budget, tuple) else (budget, None)
+        )
+        if stats.count <= max_count and (
+            max_duration is None or stats.duration <= max_duration
+        ):
+            return
+        message = (
+            f'{request.method} {request.path} ({match.view_name}): '
+            f'{stats.count} SQL-запросов за {stats.duration:.3f} с '
+            f'при бюджете {budget}'
+        )
+        if settings.QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует запросы с заголовком settings.PROFILING_HEADER.
+
+    Включается settings.PROFILING и действует только для адресов
+    settings.INTERNAL_IPS. Профилируется доля запросов с заголовком
+    settings.PROFILING_SAMPLE_RATE и не больше одного запроса
+    в процессе одновременно, так что профилирование можно оставить
+    включённым под нагрузкой. Для каждого профиля в settings.PROFILING_DIR
+    пишутся два файла: статистика cProfile (.prof, открывается pstats)
+    и JSON с временем запроса, временем отрисовки шаблонов и SQL-запросами
+    с их временем и местом вызова. Имя файлов без расширения возвращается
+    в заголовке X-Profile-Id. Хранятся последние
+    settings.PROFILING_MAX_PROFILES профилей.
+
+    Под ASGI cProfile видит только поток цикла событий: в профиль
+    попадают и другие корутины, выполнявшиеся во время запроса, но не
+    код в потоках sync_to_async. SQL-запросы учитываются полностью.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled(request):
+            return self.get_response(request)
+        if not profiling_lock.acquire(blocking=False):
+            return self.get_response(request)
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        profile.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.stop()
+            current_profile.reset(token)
+            profiling_lock.release()
+        response[PROFILE_ID_HEADER] = self.save(
+            request, response, profile
+        )
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled(request):
+            return await self.get_response(request)
+        if not profiling_lock.acquire(blocking=False):
+            return await self.get_response(request)
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        profile.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profile.stop()
+            current_profile.reset(token)
+            profiling_lock.release()
+        response[PROFILE_ID_HEADER] = await sync_to_async(self.save)(
+            request, response, profile
+        )
+        return response
+
+    def sampled(self, request):
+        return (
+            settings.PROFILING
+            and settings.PROFILING_HEADER in request.headers
+            and request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS
+            and random.random() < settings.PROFILING_SAMPLE_RATE
+        )
+
+    def save(self, request, response, profile):
+        seconds, nanoseconds = divmod(time.time_ns(), 10 ** 9)
+        name = (
+            f'{time.strftime("%Y%m%d-%H%M%S", time.localtime(seconds))}'
+            f'-{nanoseconds:09d}-{uuid4().hex[:8]}'
+        )
+        directory = Path(settings.PROFILING_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        profile.profiler.dump_stats(directory / f'{name}.prof')
+        match = request.resolver_match
+        report = {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view_name': match and match.view_name,
+            'status': response.status_code,
+            'duration': round(profile.duration, 6),
+            'template_duration': round(profile.template_duration(), 6),
+            'query_count': len(profile.queries),
+            'query_duration': round(
+                sum(query['duration'] for query in profile.queries), 6
+            ),
+            'queries': profile.queries,
+        }
+        (directory / f'{name}.json').write_text(
+            json.dumps(report, ensure_ascii=False, indent=2),
+            encoding='utf-8',
+        )
+        self.prune(directory)
+        return name
+
+    def prune(self, directory):
+        """Удаляет профили сверх PROFILING_MAX_PROFILES, старые первыми."""
+        # Имя начинается со времени создания, порядок имён — порядок
+        # профилей.
+        names = sorted(path.stem for path in directory.glob('*.json'))
+        extra = len(names) - settings.PROFILING_MAX_PROFILES
+        for name in names[:max(extra, 0)]:
+            for suffix in ('.prof', '.json'):
+                (directory / f'{name}{suffix}').unlink(missing_ok=True)
+
+
+class MetricsMiddleware:
+    """
+    Собирает метрики запросов для страницы /metrics, см. metrics.py.
+
+    Стоит перед QueryBudgetMiddleware, чтобы получить число
+    SQL-запросов из request.query_stats.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - start)
+        return response
+
+    def record(self, request, response, duration):
+        match = request.resolver_match
+        view = match.view_name if match else UNRESOLVED
+        method = (
+            request.method if request.method in METRICS_METHODS
+            else UNRESOLVED
+        )
+        store.observe(
+            'request_duration_seconds', labels(view=view, method=method),
+            duration
+        )
+        stats = getattr(request, 'query_stats', None)
+        if stats is not None:
+            store.observe('request_queries', labels(view=view), stats.count)
+        # Размер потокового ответа неизвестен, пока он не отправлен.
+        if not response.streaming:
+            store.observe(
+                'response_size_bytes', labels(view=view),
+                len(response.content)
+            )
+        store.inc('responses_total', labels(
+            view=view, status=f'{response.status_code // 100}xx'
+        ))
+        if CACHE_HEADER in response:
+            store.inc('cache_requests_total', labels(
+                view=view, result=response[CACHE_HEADER].lower()
+            ))
+        store.flush()
@@ -0,0 +1,169 @@
+"""
+Разделение чтения и записи между основной базой и репликой.
+
+Все записи идут в основную базу. В реплику попадает только чтение
+моделей из REPLICA_APPS внутри replica_reads(): его включают страницы
+новостей. Сессии, пользователи и прочее всегда читаются с основной
+базы, чтобы отставание реплики не разлогинивало пользователей.
+
+Реплика используется, только если известно, когда её обновили:
+время начала копирования команда sync_replica записывает в саму
+реплику. Команда работает в отдельном процессе, и кеш процесса
+сервера (LocMemCache) эту отметку бы не увидел.
+"""
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.connection import ConnectionDoesNotExist
+
+REPLICA = 'replica'
+
+# Таблица с отметкой о копировании. Есть только в реплике: копирование
+# заменяет файл реплики целиком, и отметка записывается после него.
+REPLICA_SYNCED = 'replica_synced'
+
+# Прочитанная отметка хранится в кеше столько секунд. Устаревшая отметка
+# меньше настоящей, и страница лишь дольше читается из основной базы.
+SYNCED_AT_KEY = 'replica:synced'
+SYNCED_AT_TIMEOUT = 1
+
+REPLICA_APPS = {'news'}
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+reading_from_replica = ContextVar('reading_from_replica', default=False)
+
+
+def replica_available():
+    """
+    Реплика настроена и это отдельная база.
+
+    В тестах реплика — зеркало основной базы (TEST MIRROR), и чтение
+    через второе соединение не увидело бы данных из незавершённой
+    транзакции теста.
+    """
+    try:
+        replica = connections[REPLICA]
+    except ConnectionDoesNotExist:
+        return False
+    return (
+        replica.settings_dict['NAME']
+        != connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+    )
+
+
+def mark_replica_synced(target, started):
+    """
+    Записывает в реплику, что она содержит данные на момент started.
+
+    target — соединение sqlite3 с файлом реплики. Прочитанная отметка
+    сбрасывается из кеша, если он общий с сервером.
+    """
+    with target:
+        target.execute(
+            f'CREATE TABLE IF NOT EXISTS {REPLICA_SYNCED} '
+            f'(started INTEGER NOT NULL)'
+        )
+        target.execute(f'DELETE FROM {REPLICA_SYNCED}')
+        target.execute(
+            f'INSERT INTO {REPLICA_SYNCED} (started) VALUES (?)', (started,)
+        )
+    cache.delete(SYNCED_AT_KEY)
+
+
+def read_synced_at(name):
+    """
+    Отметка из файла реплики или 0, если её ещё не копировали.
+
+    Файл читается отдельным соединением только для чтения: запрос
+    не попадает в журнал запросов страницы и не создаёт пустой файл.
+    """
+    try:
+        source = sqlite3.connect(f'file:{name}?mode=ro', uri=True)
+        try:
+            row = source.execute(
+                f'SELECT started FROM {REPLICA_SYNCED}'
+            ).fetchone()
+        finally:
+            source.close()
+    except sqlite3.Error:
+        return 0
+    return row[0] if row else 0
+
+
+def replica_synced_at():
+    """Время последнего копирования в реплику в наносекундах или None."""
+    if not replica_available():
+        return None
+    synced_at = cache.get(SYNCED_AT_KEY)
+    if synced_at is None:
+        synced_at = read_synced_at(connections[REPLICA].settings_dict['NAME'])
+        cache.set(SYNCED_AT_KEY, synced_at, SYNCED_AT_TIMEOUT)
+    return synced_at or None
+
+
+async def areplica_synced_at():
+    """Асинхронный вариант replica_synced_at()."""
+    if not replica_available():
+        return None
+    synced_at = await cache.aget(SYNCED_AT_KEY)
+    if synced_at is None:
+        synced_at = read_synced_at(connections[REPLICA].settings_dict['NAME'])
+        await cache.aset(SYNCED_AT_KEY, synced_at, SYNCED_AT_TIMEOUT)
+    return synced_at or None
+
+
+@contextmanager
+def replica_reads(request, changed_at, synced_at):
+    """
+    Направляет чтение внутри блока в реплику.
+
+    changed_at — время последнего изменения данных страницы, synced_at —
+    время последнего копирования в реплику, оба в наносекундах. Пока
+    реплика не обновлена после изменения, а также REPLICA_LAG секунд
+    после него страница читается из основной базы: так автор сразу
+    видит свою запись, а устаревшая страница не попадает в кеш
+    и в ETag.
+    """
+    age = time.time_ns() - changed_at
+    if (
+        request.method not in SAFE_METHODS
+        or synced_at is None
+        or synced_at <= changed_at
+        or age < settings.REPLICA_LAG * 10 ** 9
+    ):
+        yield
+        return
+    token = reading_from_replica.set(True)
+    try:
+        yield
+    finally:
+        reading_from_replica.reset(token)
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if (
+            reading_from_replica.get()
+            and model._meta.app_label in REPLICA_APPS
+            and replica_available()
+        ):
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """В реплике те же данные, что и в основной базе."""
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        """Схема реплики копируется вместе с данными, см. sync_replica."""
+        return db == DEFAULT_DB_ALIAS
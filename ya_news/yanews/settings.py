@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -21,6 +22,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yanews.middleware.ProfilingMiddleware',
+    'yanews.middleware.MetricsMiddleware',
+    'yanews.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -30,7 +34,11 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'yanews.urls'
+# Под ASGI (см. asgi.py) чтение новостей обслуживают асинхронные
+# представления, под WSGI — синхронные.
+ASYNC_VIEWS = os.getenv('YANEWS_ASYNC_VIEWS') == '1'
+
+ROOT_URLCONF = 'yanews.asgi_urls' if ASYNC_VIEWS else 'yanews.urls'
 
 TEMPLATES = [
     {
@@ -51,14 +59,92 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yanews.wsgi.application'
 
 
+# Профиль SQLite для нескольких процессов. WAL позволяет читать во
+# время записи, BEGIN IMMEDIATE берёт блокировку записи в начале
+# транзакции, а не при первой записи, и конфликтующая транзакция ждёт
+# timeout секунд (это busy_timeout) вместо ошибки "database is locked".
+# PRAGMA выполняются для каждого нового соединения, значения можно
+# переопределить переменными окружения.
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv('YANEWS_SQLITE_JOURNAL_MODE', 'wal'),
+    'synchronous': os.getenv('YANEWS_SQLITE_SYNCHRONOUS', 'normal'),
+    'mmap_size': os.getenv('YANEWS_SQLITE_MMAP_SIZE', str(128 * 2 ** 20)),
+    # Отрицательное значение — размер в КиБ.
+    'cache_size': os.getenv('YANEWS_SQLITE_CACHE_SIZE', '-20000'),
+}
+
+SQLITE_OPTIONS = {
+    'init_command': ';'.join(
+        f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()
+    ),
+    'transaction_mode': os.getenv(
+        'YANEWS_SQLITE_TRANSACTION_MODE', 'IMMEDIATE'
+    ),
+    'timeout': float(os.getenv('YANEWS_SQLITE_TIMEOUT', '5')),
+}
+
+# Под ASGI каждый запрос может открыть соединение в своём потоке,
+# и постоянные соединения копились бы незакрытыми, поэтому там они
+# по умолчанию выключены.
+CONN_MAX_AGE = int(
+    os.getenv('YANEWS_CONN_MAX_AGE', '0' if ASYNC_VIEWS else '60')
+)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_OPTIONS,
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+
+# Копия основной базы для чтения страниц новостей, включается путём
+# к файлу. Локально обновляется командой sync_replica.
+if os.getenv('YANEWS_REPLICA_DB'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('YANEWS_REPLICA_DB'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['yanews.routers.PrimaryReplicaRouter']
+
+# Запас в секундах на изменения, которые ещё не зафиксированы, когда
+# начинается копирование в реплику: столько после изменения страница
+# читается из основной базы, даже если реплику уже обновили.
+REPLICA_LAG = 10
+
+
+# При запуске нескольких процессов нужен общий бэкенд (Redis, Memcached),
+# иначе поколения кеша страниц и закешированные пользователи
+# в процессах разойдутся.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
 
+# Сессии и пользователь сессии: db — как по умолчанию в Django,
+# cache — сессии в кеше с записью в базу, cookies — в подписанной
+# cookie. В режимах cache и cookies пользователь тоже берётся из кеша,
+# и авторизованный запрос обходится без запросов к django_session
+# и auth_user.
+SESSION_MODE = os.getenv('YANEWS_SESSION_MODE', 'db')
+
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cached_db',
+    'cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_MODE]
+
+AUTHENTICATION_BACKENDS = ['news.backends.CachedModelBackend']
+
+USER_CACHE_TIMEOUT = None if SESSION_MODE == 'db' else 60 * 15
+
+
 AUTH_PASSWORD_VALIDATORS = []
 
 
@@ -81,4 +167,67 @@ LOGIN_REDIRECT_URL = reverse_lazy('news:home')
 
 NEWS_COUNT_ON_HOME_PAGE = 10
 
-BAD_WORDS = ['редиска', 'дурак']
+COMMENTS_COUNT_ON_PAGE = 50
+
+NEWS_SEARCH_RESULTS_ON_PAGE = 10
+
+NEWS_ARCHIVE_PAGE_SIZE = 20
+
+NEWS_CACHE_TIMEOUT = 60 * 5
+
+# Ленты новостей, см. news.feeds. Записи лент сбрасываются при
+# изменении новости, поэтому хранятся дольше страниц.
+NEWS_FEED_PAGE_SIZE = 50
+
+NEWS_FEED_MAX_PAGE_SIZE = 1000
+
+NEWS_FEED_CHUNK_SIZE = 100
+
+NEWS_FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+BAD_WORDS = ['редиска', 'негодяй', 'дурак']
+
+# Бюджет SQL-запросов по имени маршрута: число запросов или пара
+# (число запросов, время работы БД в секундах). Учитываются и запросы
+# сессии и пользователя. Превышение пишется в лог, а в тестах, где
+# QUERY_BUDGET_RAISE включён, приводит к исключению.
+QUERY_BUDGETS = {
+    'news:home': 3,
+    'news:detail': 4,
+    'news:comments': 4,
+    'news:search': 4,
+    'news:archive': 3,
+    'news:archive_year': 4,
+    'news:archive_month': 4,
+    'news:edit': 4,
+    'news:delete': 4,
+}
+
+QUERY_BUDGET_RAISE = False
+
+# Профилирование запросов с заголовком PROFILING_HEADER с адресов
+# INTERNAL_IPS, см. yanews.middleware.ProfilingMiddleware.
+# PROFILING_SAMPLE_RATE — доля таких запросов, которые профилируются,
+# PROFILING_MAX_PROFILES — сколько последних профилей хранить.
+PROFILING = os.getenv('YANEWS_PROFILING') == '1'
+
+PROFILING_HEADER = 'X-Profile'
+
+PROFILING_SAMPLE_RATE = float(
+    os.getenv('YANEWS_PROFILING_SAMPLE_RATE', '1')
+)
+
+PROFILING_DIR = BASE_DIR / 'profiles'
+
+PROFILING_MAX_PROFILES = 100
+
+# Метрики для Prometheus на странице /metrics, см. yanews.metrics.
+# Процессы складывают метрики в общий каталог METRICS_DIR, лучше
+# в tmpfs. Без него страница показывает метрики одного процесса.
+METRICS_NAMESPACE = 'yanews'
+
+METRICS_DIR = os.getenv('YANEWS_METRICS_DIR')
+
+METRICS_FLUSH_INTERVAL = 5
+
+INTERNAL_IPS = ['127.0.0.1']
@@ -0,0 +1,13 @@
+"""
+Замеры производительности проекта YaNote.
+
+Модули запускаются из каталога ya_note, например:
+
+    python -m benchmarks.routes
+"""
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanote.settings')
+django.setup()
@@ -0,0 +1,89 @@
+"""
+Число запросов, задержка и память для каждого маршрута notes.urls
+при разном количестве заметок у пользователя.
+
+    python -m benchmarks.routes --sizes 10 1000 100000
+"""
+import argparse
+
+from django.contrib.auth import get_user_model
+from django.test import Client
+from django.urls import reverse
+
+from benchmarks.utils import (
+    measure, print_table, temporary_database, write_results
+)
+from notes import urls
+from notes.models import Note
+
+User = get_user_model()
+
+BATCH_SIZE = 5000
+
+
+def seed(author, size):
+    """Доводит число заметок автора до size."""
+    existing = Note.objects.filter(author=author).count()
+    for start in range(existing, size, BATCH_SIZE):
+        Note.objects.bulk_create(
+            Note(
+                title=f'Заметка {i}',
+                text=f'Текст заметки {i}',
+                slug=f'note-{i}',
+                author=author,
+            )
+            for i in range(start, min(start + BATCH_SIZE, size))
+        )
+
+
+def build_routes(note):
+    """Для каждого маршрута — клиент и адрес."""
+    return {
+        'notes:home': ('anonymous', reverse('notes:home')),
+        'notes:add': ('author', reverse('notes:add')),
+        'notes:edit': ('author', reverse('notes:edit', args=(note.slug,))),
+        'notes:detail': (
+            'author', reverse('notes:detail', args=(note.slug,))
+        ),
+        'notes:delete': (
+            'author', reverse('notes:delete', args=(note.slug,))
+        ),
+        'notes:list': ('author', reverse('notes:list')),
+        'notes:success': ('author', reverse('notes:success')),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10, 1000, 100000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help='путь к файлу результатов')
+    args = parser.parse_args()
+
+    results = []
+    with temporary_database():
+        author = User.objects.create(username='author')
+        clients = {'anonymous': Client(), 'author': Client()}
+        clients['author'].force_login(author)
+        for size in sorted(args.sizes):
+            seed(author, size)
+            routes = build_routes(Note.objects.filter(author=author).last())
+            missing = {
+                f'{urls.app_name}:{pattern.name}'
+                for pattern in urls.urlpatterns
+            } - routes.keys()
+            if missing:
+                parser.error(f'Нет сценария для маршрутов: {missing}')
+            for name, (client, url) in routes.items():
+                result = measure(
+                    lambda: clients[client].get(url), args.repeat
+                )
+                results.append({'route': name, 'size': size, **result})
+    print_table(results, ('route', 'size', 'status', 'queries', 'p50_ms',
+                          'p95_ms', 'peak_kib'))
+    print('Результаты:', write_results('routes', results, args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Сравнение slugify() из pytils с cached_slugify на русских заголовках.
+
+Заголовки повторяются с распределением Ципфа, как при импорте заметок:
+одни и те же «Список покупок» и «Встреча с командой» встречаются часто.
+
+    python -m benchmarks.slugify --titles 1000 10000 --distinct 500 5000
+"""
+import argparse
+import random
+import timeit
+
+from pytils.translit import slugify
+
+from benchmarks.utils import print_table, write_results
+from notes.slugs import cached_slugify
+
+SUBJECTS = (
+    'Список покупок', 'Встреча с командой', 'План на неделю',
+    'Идеи для отпуска', 'Конспект лекции', 'Рецепт борща',
+    'Задачи по проекту', 'Отчёт за квартал', 'Заметки с конференции',
+    'Книги на лето', 'Тренировка', 'Ремонт на кухне',
+    'Подарки к Новому году', 'Вопросы к собеседованию',
+    'Расходы за месяц', 'Созвон с заказчиком',
+)
+DETAILS = (
+    'срочно', 'черновик', 'важно', 'до пятницы', 'для Марины',
+    'по итогам обсуждения', 'вторая часть', 'в Санкт-Петербурге',
+    'с поправками', 'на согласование', '№ 3', '(исправленное)',
+)
+
+
+def make_titles(count, distinct, rng):
+    """Заголовки: count штук из distinct различных, частые — в начале."""
+    variants = [
+        f'{rng.choice(SUBJECTS)}: {rng.choice(DETAILS)} {number}'
+        for number in range(distinct)
+    ]
+    weights = [1 / rank for rank in range(1, distinct + 1)]
+    return rng.choices(variants, weights=weights, k=count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--titles', type=int, nargs='+',
+                        default=[1000, 10000])
+    parser.add_argument('--distinct', type=int, nargs='+',
+                        default=[100, 1000, 10000],
+                        help='число различных заголовков')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='путь к файлу результатов')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    results = []
+    for count in args.titles:
+        for distinct in args.distinct:
+            titles = make_titles(count, distinct, rng)
+            assert all(cached_slugify(t) == slugify(t) for t in titles)
+            direct = timeit.timeit(
+                lambda: [slugify(title) for title in titles],
+                number=args.repeat
+            )
+
+            def cached():
+                # Каждый прогон начинается с пустого кеша, как новый
+                # процесс, иначе со второго прогона промахов не будет.
+                cached_slugify.cache_clear()
+                return [cached_slugify(title) for title in titles]
+
+            memoized = timeit.timeit(cached, number=args.repeat)
+            info = cached_slugify.cache_info()
+            results.append({
+                'titles': count,
+                'distinct': distinct,
+                'pytils_ms': round(direct / args.repeat * 1000, 2),
+                'cached_ms': round(memoized / args.repeat * 1000, 2),
+                'hit_rate': round(info.hits / count, 3),
+            })
+    print_table(results, ('titles', 'distinct', 'pytils_ms', 'cached_ms',
+                          'hit_rate'))
+    print('Результаты:', write_results('slugify', results, args.output))
+
+
+if __name__ == '__main__':
+    main()
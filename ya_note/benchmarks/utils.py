@@ -0,0 +1,122 @@
+import json
+import statistics
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.db import (
+    DEFAULT_DB_ALIAS, connection, connections, reset_queries
+)
+from django.test.utils import (
+    CaptureQueriesContext, setup_databases, setup_test_environment,
+    teardown_databases, teardown_test_environment
+)
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+
+@contextmanager
+def temporary_database(name=None):
+    """
+    Временная тестовая база с применёнными миграциями.
+
+    name — путь к файлу базы. По умолчанию база SQLite создаётся
+    в памяти, но писать в неё одновременно из нескольких потоков
+    нельзя: общий кеш страниц блокирует таблицы целиком.
+    """
+    if name is not None:
+        connections[DEFAULT_DB_ALIAS].settings_dict['TEST']['NAME'] = name
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+
+def percentile(values, percent):
+    return statistics.quantiles(values, n=100, method='inclusive')[
+        percent - 1
+    ]
+
+
+def consume(response):
+    """Читает тело потокового ответа: оно формируется при чтении."""
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def measure(request, repeat, before=None):
+    """
+    Выполняет request() repeat раз и возвращает число SQL-запросов,
+    p50/p95 времени ответа в миллисекундах и пиковую память в КиБ.
+
+    before() вызывается перед каждым замером, например, чтобы
+    очистить кеш. Память замеряется отдельным прогоном: tracemalloc
+    сильно замедляет выполнение.
+    """
+    timings = []
+    for _ in range(repeat):
+        if before:
+            before()
+        # Журнал запросов очищается в начале каждого запроса,
+        # CaptureQueriesContext должен начинать с пустого.
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = consume(request())
+            timings.append((time.perf_counter() - start) * 1000)
+        query_count = len(queries)
+    if before:
+        before()
+    tracemalloc.start()
+    consume(request())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'status': response.status_code,
+        'queries': query_count,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def write_results(name, results, output=None):
+    """
+    Сохраняет результаты в JSON, чтобы сравнивать прогоны между
+    коммитами. По умолчанию — benchmarks/results/<name>-<коммит>.json.
+    """
+    revision = git_revision()
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        output = RESULTS_DIR / f'{name}-{revision}.json'
+    data = {
+        'benchmark': name,
+        'revision': revision,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'results': results,
+    }
+    Path(output).write_text(json.dumps(data, ensure_ascii=False, indent=2))
+    return output
+
+
+def print_table(results, columns):
+    print(' '.join(f'{column:>14}' for column in columns))
+    for row in results:
+        print(' '.join(f'{str(row[column]):>14}' for column in columns))
@@ -1,5 +1,3 @@
-from pytils.translit import slugify
-
 from django import forms
 from django.core.exceptions import ValidationError
 
@@ -16,14 +14,31 @@ class NoteForm(forms.ModelForm):
         fields = ('title', 'text', 'slug')
 
     def clean_slug(self):
-        """Обрабатывает случай, если slug не уникален."""
-        cleaned_data = super().clean()
-        slug = cleaned_data.get('slug')
-        if not slug:
-            title = cleaned_data.get('title')
-            slug = slugify(title)[:100]
-        if Note.objects.filter(
+        """
+        Проверяет, что указанный slug не занят.
+
+        Пустой slug подберёт по заголовку Note.save(), см. notes.slugs.
+        """
+        slug = self.cleaned_data['slug']
+        if slug and Note.objects.filter(
                 slug=slug
         ).exclude(id=self.instance.pk).exists():
             raise ValidationError(slug + WARNING)
         return slug
+
+    def validate_unique(self):
+        """
+        Уникальность slug уже проверена в clean_slug().
+
+        Остальные поля проверяются моделью, кроме не вошедших в форму
+        и уже не прошедших проверку.
+        """
+        exclude = {
+            field.name for field in self.instance._meta.fields
+            if field.name not in self.cleaned_data
+        }
+        exclude.add('slug')
+        try:
+            self.instance.validate_unique(exclude=exclude)
+        except ValidationError as error:
+            self.add_error(None, error)
@@ -1,7 +1,7 @@
 from django.conf import settings
 from django.db import models
 
-from pytils.translit import slugify
+from .slugs import save_with_free_slug
 
 
 class Note(models.Model):
@@ -26,13 +26,24 @@ class Note(models.Model):
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        # Покрывается составным индексом note_author_id_idx.
+        db_index=False,
     )
 
+    class Meta:
+        indexes = (
+            # Список заметок: WHERE author_id = ? AND id > ? ORDER BY id.
+            models.Index(fields=('author', 'id'), name='note_author_id_idx'),
+        )
+
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            max_slug_length = self._meta.get_field('slug').max_length
-            self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        if self.slug:
+            super().save(*args, **kwargs)
+            return
+        # Адрес подбирается по заголовку, см. notes.slugs.
+        save_with_free_slug(self, lambda: super(Note, self).save(
+            *args, **kwargs
+        ))
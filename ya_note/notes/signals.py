@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import user_key
+
+
+@receiver((post_save, post_delete), sender=settings.AUTH_USER_MODEL)
+def invalidate_user(sender, instance, **kwargs):
+    """Пользователь сессии закеширован, см. CachedModelBackend."""
+    cache.delete(user_key(instance.pk))
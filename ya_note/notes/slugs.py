@@ -0,0 +1,112 @@
+"""
+Свободный slug для заметки без явно указанного адреса.
+
+Адрес получается из заголовка. Все занятые адреса вида slug и slug-N
+выбираются одним запросом по двум участкам уникального индекса,
+и берётся наименьший свободный номер. Между выбором и вставкой адрес
+может занять параллельный запрос — тогда вставка нарушит уникальность,
+и адрес выбирается заново.
+"""
+import re
+from contextlib import nullcontext
+from functools import lru_cache
+from itertools import count
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import Q
+from pytils.translit import slugify
+
+MAX_ATTEMPTS = 5
+
+# Сколько последних заголовков помнит cached_slugify.
+SLUG_CACHE_SIZE = 4096
+
+# Адрес для заголовка, в котором нет ни букв, ни цифр.
+DEFAULT_SLUG = 'note'
+
+# Все адреса base-N лежат в диапазоне base- <= slug < base.: точка
+# следует за дефисом в ASCII. Условие по диапазону, в отличие от LIKE,
+# читает только нужный участок уникального индекса slug и не задевает
+# адреса, которые лишь начинаются с base, вроде base2 или base-x.
+NUMBER_SEPARATOR = '-'
+AFTER_SEPARATOR = chr(ord(NUMBER_SEPARATOR) + 1)
+
+
+@lru_cache(maxsize=SLUG_CACHE_SIZE)
+def cached_slugify(title):
+    """
+    slugify() из pytils с памятью на последние SLUG_CACHE_SIZE заголовков.
+
+    Транслитерация написана на чистом Python и заметна при импорте
+    длинных заголовков, которые часто повторяются. Попадания и промахи
+    показывает cached_slugify.cache_info().
+    """
+    return slugify(title)
+
+
+def title_slug(note):
+    max_length = note._meta.get_field('slug').max_length
+    return cached_slugify(note.title)[:max_length] or DEFAULT_SLUG
+
+
+def taken_slugs(note, base):
+    """Адреса других заметок: base и вида base-<суффикс>."""
+    return set(
+        type(note)._default_manager.filter(
+            Q(slug=base) | Q(
+                slug__gte=base + NUMBER_SEPARATOR,
+                slug__lt=base + AFTER_SEPARATOR,
+            )
+        ).exclude(pk=note.pk).values_list('slug', flat=True)
+    )
+
+
+def free_slug(note, base):
+    """base, если он свободен, иначе base-N с наименьшим свободным N."""
+    max_length = note._meta.get_field('slug').max_length
+    shortened = False
+    while True:
+        taken = taken_slugs(note, base)
+        if base not in taken and not shortened:
+            return base
+        pattern = re.compile(rf'{re.escape(base + NUMBER_SEPARATOR)}(\d+)')
+        numbers = {
+            int(match[1]) for match in map(pattern.fullmatch, taken) if match
+        }
+        number = next(n for n in count(2) if n not in numbers)
+        slug = f'{base}{NUMBER_SEPARATOR}{number}'
+        if len(slug) <= max_length:
+            return slug
+        # Номер не поместился: основа укорачивается, и это уже другой
+        # префикс со своими занятыми адресами.
+        base = base[:max_length - len(slug) + len(base)]
+        shortened = True
+
+
+def save_with_free_slug(note, save):
+    """
+    Сохраняет заметку через save(), подобрав ей свободный адрес.
+
+    Внутри транзакции вставка выполняется в точке сохранения, чтобы
+    после нарушения уникальности транзакцию можно было продолжить.
+    """
+    base = title_slug(note)
+    using = router.db_for_write(type(note), instance=note)
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        note.slug = free_slug(note, base)
+        connection = transaction.get_connection(using)
+        try:
+            with (
+                transaction.atomic(using) if connection.in_atomic_block
+                else nullcontext()
+            ):
+                save()
+            return
+        except IntegrityError:
+            # Уникальность могла нарушиться не по адресу.
+            slug_taken = type(note)._default_manager.filter(
+                slug=note.slug
+            ).exclude(pk=note.pk).exists()
+            if attempt == MAX_ATTEMPTS or not slug_taken:
+                note.slug = ''
+                raise
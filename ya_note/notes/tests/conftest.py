@@ -1,4 +1,4 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
@@ -8,6 +8,7 @@ User = get_user_model()
 
 
 # В файле conftest.py исправляем BaseNoteList
+@override_settings(QUERY_BUDGET_RAISE=True)
 class BaseNoteList(TestCase):
 
     @classmethod
@@ -1,4 +1,10 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import Client, override_settings
+
 from notes.forms import NoteForm
+from notes.models import Note
 from notes.tests.conftest import BaseNoteList
 
 
@@ -33,3 +39,105 @@ class TestAuthorNoteList(BaseNoteList):
                 self.assertIn('form', response.context)
                 form = response.context['form']
                 self.assertIsInstance(form, NoteForm)
+
+
+@override_settings(NOTES_COUNT_ON_PAGE=5)
+class TestNoteListPages(BaseNoteList):
+
+    def create_notes(self, count):
+        Note.objects.bulk_create(
+            Note(
+                title=f'Заметка {i}', text='Текст' * 1000,
+                slug=f'note-{i}', author=self.author,
+            )
+            for i in range(count)
+        )
+
+    def test_query_count_does_not_depend_on_note_count(self):
+        """Тест постоянного числа запросов к списку заметок"""
+        for count in (0, 20):
+            with self.subTest(count=count):
+                self.create_notes(count)
+                # Сессия, пользователь и страница заметок.
+                with self.assertNumQueries(3):
+                    self.client.get(self.LIST_URL)
+
+    def test_page_size_is_bounded(self):
+        """Тест ограничения числа заметок на странице"""
+        self.create_notes(20)
+        response = self.client.get(self.LIST_URL)
+        notes = response.context['object_list']
+        self.assertEqual(len(notes), 5)
+        self.assertEqual(notes[0], self.note)
+        self.assertEqual(response.context['next_cursor'], notes[-1].pk)
+
+    def test_pages_cover_all_notes_once(self):
+        """Тест обхода всех заметок автора по курсору"""
+        self.create_notes(12)
+        seen = []
+        url = self.LIST_URL
+        while url:
+            response = self.client.get(url)
+            seen += [note.pk for note in response.context['object_list']]
+            cursor = response.context['next_cursor']
+            url = cursor and f'{self.LIST_URL}?after={cursor}'
+        self.assertEqual(seen, list(
+            Note.objects.filter(author=self.author).values_list(
+                'pk', flat=True
+            ).order_by('pk')
+        ))
+
+    def test_note_text_is_not_loaded(self):
+        """Тест того, что список не загружает текст заметок"""
+        response = self.client.get(self.LIST_URL)
+        for note in response.context['object_list']:
+            self.assertIn('text', note.get_deferred_fields())
+
+    def test_invalid_cursor(self):
+        """Тест ответа на некорректный курсор"""
+        response = self.client.get(f'{self.LIST_URL}?after=abc')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+
+class TestSessionModes(BaseNoteList):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_cached_session_and_user_skip_queries(self):
+        """Тест того, что в режимах cache и cookies сессия и пользователь
+        не читаются из базы
+        """
+        engines = (
+            ('django.contrib.sessions.backends.db', None, 3),
+            ('django.contrib.sessions.backends.cached_db', 60, 1),
+            ('django.contrib.sessions.backends.signed_cookies', 60, 1),
+        )
+        for engine, timeout, queries in engines:
+            with self.subTest(engine=engine), override_settings(
+                SESSION_ENGINE=engine, USER_CACHE_TIMEOUT=timeout
+            ):
+                client = Client()
+                client.force_login(self.author)
+                client.get(self.LIST_URL)
+                with self.assertNumQueries(queries):
+                    response = client.get(self.LIST_URL)
+                self.assertIn(self.note, response.context['object_list'])
+
+    # Сброс недействительной сессии не укладывается в бюджет страницы.
+    @override_settings(USER_CACHE_TIMEOUT=60, QUERY_BUDGET_RAISE=False)
+    def test_cached_user_is_invalidated(self):
+        """Тест сброса закешированного пользователя при его изменении"""
+        self.client.get(self.LIST_URL)
+        self.author.username = 'renamed'
+        self.author.save()
+        response = self.client.get(self.LIST_URL)
+        self.assertEqual(response.context['user'].username, 'renamed')
+
+        self.author.set_password('new-password')
+        self.author.save()
+        response = self.client.get(self.LIST_URL)
+        self.assertRedirects(
+            response, f'{self.LOGIN_URL}?next={self.LIST_URL}'
+        )
@@ -1,10 +1,18 @@
+import threading
 from http import HTTPStatus
+from unittest import mock
 
-from django.test import Client
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, connections
+from django.test import Client, TestCase, TransactionTestCase
 
+from notes import slugs
 from notes.models import Note
 from notes.tests.conftest import BaseNoteList
 
+User = get_user_model()
+
 
 class TestLogic(BaseNoteList):
 
@@ -142,3 +150,158 @@ class TestLogic(BaseNoteList):
         self.assertEqual(unchanged_note.text, original_text)
         self.assertEqual(unchanged_note.slug, original_slug)
         self.assertEqual(unchanged_note.author, original_author)
+
+
+class TestSlugAllocation(BaseNoteList):
+
+    def create(self, title):
+        return Note.objects.create(
+            title=title, text='Текст', author=self.author
+        )
+
+    def test_same_titles_get_numbered_slugs(self):
+        """Тест нумерации адресов заметок с одинаковым заголовком"""
+        self.create('Заголовок-10')
+        for expected in ('zagolovok', 'zagolovok-2', 'zagolovok-3'):
+            # Поиск занятых адресов, вставка в точке сохранения.
+            with self.assertNumQueries(4):
+                note = self.create('Заголовок')
+            self.assertEqual(note.slug, expected)
+
+    def test_free_number_is_reused(self):
+        """Тест выбора наименьшего свободного номера"""
+        notes = [self.create('Заголовок') for _ in range(3)]
+        notes[1].delete()
+        self.assertEqual(self.create('Заголовок').slug, notes[1].slug)
+
+    def test_long_title_is_shortened_for_number(self):
+        """Тест укорачивания адреса, если номер не помещается"""
+        title = 'x' * 150
+        first = self.create(title)
+        second = self.create(title)
+        self.assertEqual(len(first.slug), 100)
+        self.assertEqual(second.slug, 'x' * 98 + '-2')
+
+    def test_only_numbered_slugs_are_fetched(self):
+        """Тест того, что адреса, лишь начинающиеся с основы, не читаются"""
+        for slug in ('zagolovok', 'zagolovok-2', 'zagolovok-x',
+                     'zagolovok2', 'zagolovok_3', 'zagolovoka-2'):
+            Note.objects.create(
+                title='Заголовок', text='Текст', author=self.author,
+                slug=slug
+            )
+        note = Note(title='Заголовок', text='Текст', author=self.author)
+        self.assertEqual(
+            slugs.taken_slugs(note, 'zagolovok'),
+            {'zagolovok', 'zagolovok-2', 'zagolovok-x'}
+        )
+        self.assertEqual(slugs.free_slug(note, 'zagolovok'), 'zagolovok-3')
+
+    def test_slugify_is_memoized(self):
+        """Тест повторной транслитерации одинаковых заголовков из кеша"""
+        slugs.cached_slugify.cache_clear()
+        self.addCleanup(slugs.cached_slugify.cache_clear)
+        for _ in range(3):
+            self.create('Заголовок')
+        info = slugs.cached_slugify.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 2))
+        self.assertEqual(info.maxsize, slugs.SLUG_CACHE_SIZE)
+
+    def test_title_without_letters(self):
+        """Тест адреса для заголовка без букв и цифр"""
+        self.assertEqual(self.create('!!!').slug, slugs.DEFAULT_SLUG)
+
+    def test_concurrent_insert_is_retried(self):
+        """Тест повторного выбора адреса, если его заняли параллельно"""
+        self.create('Заголовок')
+        taken_slugs = slugs.taken_slugs
+        calls = []
+
+        def stale_taken_slugs(note, base):
+            # Первый запрос не видит заметку, вставленную параллельно.
+            calls.append(base)
+            return set() if len(calls) == 1 else taken_slugs(note, base)
+
+        with mock.patch.object(slugs, 'taken_slugs', stale_taken_slugs):
+            note = self.create('Заголовок')
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(note.slug, 'zagolovok-2')
+        self.assertEqual(Note.objects.filter(author=self.author).count(), 3)
+
+    def test_other_integrity_errors_are_raised(self):
+        """Тест ошибки, не связанной с адресом заметки"""
+        note = Note(title='Заголовок', text='Текст', author_id=0)
+        with mock.patch.object(
+            Note, 'save_base', side_effect=IntegrityError
+        ), self.assertRaises(IntegrityError):
+            note.save()
+        self.assertEqual(note.slug, '')
+
+    def test_form_allocates_slug_for_same_title(self):
+        """Тест формы: пустой slug для повторного заголовка"""
+        data = {'title': self.note.title, 'text': 'Текст', 'slug': ''}
+        self.create(self.note.title)
+        response = self.client.post(self.ADD_URL, data=data)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertTrue(
+            Note.objects.filter(slug='zagolovok-2', text='Текст').exists()
+        )
+
+
+class TestConcurrentSlugAllocation(TransactionTestCase):
+
+    def test_concurrent_notes_get_distinct_slugs(self):
+        """Тест одновременного создания заметок с одинаковым заголовком
+        в двух потоках
+        """
+        author = User.objects.create_user(username='author')
+        barrier = threading.Barrier(2, timeout=5)
+        waited = set()
+        taken_slugs = slugs.taken_slugs
+        errors = []
+
+        def synced_taken_slugs(note, base):
+            taken = taken_slugs(note, base)
+            # Оба потока выбирают адрес до вставки и получают один
+            # и тот же свободный адрес.
+            if threading.get_ident() not in waited:
+                waited.add(threading.get_ident())
+                barrier.wait()
+            return taken
+
+        def create():
+            try:
+                Note.objects.create(
+                    title='Заголовок', text='Текст', author=author
+                )
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=create) for _ in range(2)]
+        with mock.patch.object(slugs, 'taken_slugs', synced_taken_slugs):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+        self.assertCountEqual(
+            Note.objects.values_list('slug', flat=True),
+            ['zagolovok', 'zagolovok-2']
+        )
+
+
+class TestSqliteProfile(TestCase):
+
+    def test_sqlite_profile_is_applied(self):
+        """Тест применения профиля SQLite к соединению"""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(
+                cursor.fetchone()[0],
+                int(settings.SQLITE_PRAGMAS['cache_size'])
+            )
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
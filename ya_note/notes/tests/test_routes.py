@@ -1,14 +1,25 @@
+import json
+import os
+import pstats
+import shutil
+import tempfile
 from http import HTTPStatus
+from pathlib import Path
 
+from asgiref.sync import SyncToAsync
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.handlers.base import BaseHandler
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
 from notes.models import Note
+from yanote.metrics import store
+from yanote.middleware import PROFILE_ID_HEADER, QueryBudgetExceeded
 
 User = get_user_model()
 
 
+@override_settings(QUERY_BUDGET_RAISE=True)
 class TestRoutes(TestCase):
 
     @classmethod
@@ -113,3 +124,149 @@ class TestRoutes(TestCase):
                 redirect_url = f"{login_url}?next={url}"
                 response = self.client.get(url)
                 self.assertRedirects(response, redirect_url)
+
+    @override_settings(QUERY_BUDGETS={'notes:list': 0})
+    def test_query_budget_exceeded(self):
+        """Тест исключения при превышении бюджета запросов в тестах."""
+        self.client.force_login(self.user)
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('notes:list'))
+
+    @override_settings(QUERY_BUDGETS={'notes:list': 0},
+                       QUERY_BUDGET_RAISE=False)
+    def test_query_budget_exceeded_is_logged(self):
+        """Тест записи в лог превышения бюджета запросов вне тестов."""
+        self.client.force_login(self.user)
+        with self.assertLogs('yanote.middleware', 'WARNING') as logs:
+            response = self.client.get(reverse('notes:list'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('notes:list', logs.output[0])
+
+    def test_profiling_saves_profile(self):
+        """Тест сохранения профиля запроса с заголовком профилирования."""
+        directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.client.force_login(self.user)
+        with override_settings(PROFILING=True, PROFILING_DIR=directory):
+            response = self.client.get(
+                reverse('notes:list'), headers={'X-Profile': '1'}
+            )
+        name = response[PROFILE_ID_HEADER]
+        report = json.loads(
+            (directory / f'{name}.json').read_text(encoding='utf-8')
+        )
+        self.assertEqual(report['view_name'], 'notes:list')
+        self.assertGreater(report['template_duration'], 0)
+        self.assertEqual(report['query_count'], len(report['queries']))
+        self.assertTrue(all('stack' in query for query in report['queries']))
+        stats = pstats.Stats(str(directory / f'{name}.prof'))
+        self.assertGreater(stats.total_calls, 0)
+
+    def test_profiling_is_opt_in(self):
+        """Тест того, что без заголовка или вне выборки запрос
+        не профилируется.
+        """
+        directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        cases = (({}, 1), ({'X-Profile': '1'}, 0))
+        for headers, sample_rate in cases:
+            with self.subTest(headers=headers), override_settings(
+                PROFILING=True, PROFILING_DIR=directory,
+                PROFILING_SAMPLE_RATE=sample_rate,
+            ):
+                response = self.client.get(
+                    reverse('notes:home'), headers=headers
+                )
+                self.assertNotIn(PROFILE_ID_HEADER, response)
+        self.assertFalse(any(directory.iterdir()))
+
+    def test_profiling_is_internal_only(self):
+        """Тест того, что запросы с внешних адресов не профилируются."""
+        directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        with override_settings(PROFILING=True, PROFILING_DIR=directory):
+            response = self.client.get(
+                reverse('notes:home'), headers={'X-Profile': '1'},
+                REMOTE_ADDR='203.0.113.1'
+            )
+        self.assertNotIn(PROFILE_ID_HEADER, response)
+        self.assertFalse(any(directory.iterdir()))
+
+    def test_profiling_keeps_latest_profiles(self):
+        """Тест удаления старых профилей сверх PROFILING_MAX_PROFILES."""
+        directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        with override_settings(
+            PROFILING=True, PROFILING_DIR=directory,
+            PROFILING_MAX_PROFILES=2,
+        ):
+            names = [
+                self.client.get(
+                    reverse('notes:home'), headers={'X-Profile': '1'}
+                )[PROFILE_ID_HEADER]
+                for _ in range(3)
+            ]
+        self.assertEqual(
+            sorted(path.name for path in directory.iterdir()),
+            sorted(
+                f'{name}{suffix}' for name in names[1:]
+                for suffix in ('.json', '.prof')
+            )
+        )
+
+    def test_middleware_chain_is_async(self):
+        """Тест того, что под ASGI цепочка middleware не уходит в поток."""
+        handler = BaseHandler()
+        handler.load_middleware(is_async=True)
+        self.assertNotIsInstance(handler._middleware_chain, SyncToAsync)
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class TestMetrics(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser')
+        cls.METRICS_URL = reverse('metrics')
+        cls.LIST_URL = reverse('notes:list')
+
+    def setUp(self):
+        self.directory = Path(
+            self.enterContext(tempfile.TemporaryDirectory())
+        )
+        self.enterContext(override_settings(METRICS_DIR=self.directory))
+        store.reset()
+        self.addCleanup(store.reset)
+        self.client.force_login(self.user)
+
+    def test_metrics_collect_requests(self):
+        """Тест метрик времени, запросов к базе и статусов ответов."""
+        self.client.get(self.LIST_URL)
+        self.client.get('/missing/')
+        response = self.client.get(self.METRICS_URL)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        text = response.content.decode()
+        for line in (
+            'yanote_request_duration_seconds_count'
+            '{view="notes:list",method="GET"} 1',
+            'yanote_request_queries_count{view="notes:list"} 1',
+            'yanote_response_size_bytes_count{view="notes:list"} 1',
+            'yanote_responses_total{view="notes:list",status="2xx"} 1',
+            'yanote_responses_total{view="<unresolved>",status="4xx"} 1',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, text)
+
+    def test_metrics_are_summed_across_processes(self):
+        """Тест сложения метрик из файлов других процессов."""
+        self.client.get(self.LIST_URL)
+        store.flush(force=True)
+        # Файл другого воркера с такими же значениями.
+        shutil.copy(
+            self.directory / f'{os.getpid()}.json', self.directory / '1.json'
+        )
+        text = self.client.get(self.METRICS_URL).content.decode()
+        self.assertIn(
+            'yanote_responses_total{view="notes:list",status="2xx"} 2', text
+        )
+
+    def test_metrics_hidden_from_external_addresses(self):
+        """Тест недоступности метрик с адресов не из INTERNAL_IPS."""
+        response = self.client.get(self.METRICS_URL, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import BadRequest
 from django.urls import reverse_lazy
 from django.views import generic
 
@@ -32,9 +34,7 @@ class NoteCreate(NoteBase, generic.CreateView):
     form_class = NoteForm
 
     def form_valid(self, form):
-        new_note = form.save(commit=False)
-        new_note.author = self.request.user
-        new_note.save()
+        form.instance.author = self.request.user
         return super().form_valid(form)
 
 
@@ -50,9 +50,36 @@ class NoteDelete(NoteBase, generic.DeleteView):
 
 
 class NotesList(NoteBase, generic.ListView):
-    """Список всех заметок пользователя."""
+    """
+    Список заметок пользователя по страницам.
+
+    Страница начинается после заметки из параметра after: условие
+    по ключу (author, id) читает индекс сразу с нужной позиции, и
+    стоимость страницы не зависит от числа заметок. Текст заметок
+    списку не нужен и не загружается.
+    """
     template_name = 'notes/list.html'
 
+    def get_queryset(self):
+        notes = super().get_queryset().only(
+            'id', 'slug', 'title'
+        ).order_by('pk')
+        after = self.request.GET.get('after')
+        if after:
+            try:
+                notes = notes.filter(pk__gt=int(after))
+            except ValueError:
+                raise BadRequest('Некорректный курсор.')
+        return notes
+
+    def get_context_data(self, **kwargs):
+        size = settings.NOTES_COUNT_ON_PAGE
+        page = list(self.object_list[:size + 1])
+        next_cursor = page[size - 1].pk if len(page) > size else None
+        return super().get_context_data(
+            object_list=page[:size], next_cursor=next_cursor, **kwargs
+        )
+
 
 class NoteDetail(NoteBase, generic.DetailView):
     """Заметка подробно."""
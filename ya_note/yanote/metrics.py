@@ -0,0 +1,195 @@
+"""
+Метрики запросов в текстовом формате Prometheus.
+
+Каждый процесс копит метрики в памяти. Если задан METRICS_DIR, процесс
+не чаще раза в METRICS_FLUSH_INTERVAL секунд сбрасывает их в свой файл
+METRICS_DIR/<pid>.json. Страница /metrics складывает файлы всех
+процессов, поэтому при нескольких воркерах gunicorn показывает общие
+значения, с какого бы воркера её ни запросили. Файлы завершившихся
+процессов остаются, чтобы счётчики не убывали; каталог нужно очищать
+перед запуском сервера.
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+# Заголовок, которым страница сообщает о попадании в кеш: HIT или MISS.
+CACHE_HEADER = 'X-Cache'
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Имя, описание и верхние границы корзин гистограмм.
+HISTOGRAMS = {
+    'request_duration_seconds': (
+        'Время обработки запроса.',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ),
+    'request_queries': (
+        'Число SQL-запросов на запрос.',
+        (0, 1, 2, 3, 5, 10, 20, 50, 100),
+    ),
+    'response_size_bytes': (
+        'Размер тела ответа.',
+        (1000, 10_000, 50_000, 100_000, 500_000, 1_000_000),
+    ),
+}
+
+COUNTERS = {
+    'responses_total': 'Ответы по классу статуса.',
+    'cache_requests_total': 'Ответы страниц с кешем: hit или miss.',
+}
+
+
+def labels(**values):
+    return ','.join(f'{name}="{value}"' for name, value in values.items())
+
+
+class MetricsStore:
+    """Метрики текущего процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.flushed_at = time.monotonic()
+        # Ключ — (имя метрики, метки в формате Prometheus).
+        self.counters = defaultdict(int)
+        self.histograms = {}
+
+    def check_fork(self):
+        """После fork значения родителя не должны считаться дважды."""
+        if self.pid != os.getpid():
+            self.reset()
+
+    def inc(self, name, label_values, value=1):
+        with self.lock:
+            self.check_fork()
+            self.counters[name, label_values] += value
+
+    def observe(self, name, label_values, value):
+        bounds = HISTOGRAMS[name][1]
+        with self.lock:
+            self.check_fork()
+            histogram = self.histograms.setdefault((name, label_values), {
+                'buckets': [0] * len(bounds), 'sum': 0.0, 'count': 0
+            })
+            # Корзины хранятся накопленными, как их отдаёт Prometheus.
+            for index, bound in enumerate(bounds):
+                if value <= bound:
+                    histogram['buckets'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def snapshot(self):
+        with self.lock:
+            self.check_fork()
+            return {
+                'counters': [
+                    [name, label_values, value]
+                    for (name, label_values), value in self.counters.items()
+                ],
+                'histograms': [
+                    [name, label_values, dict(histogram, buckets=list(
+                        histogram['buckets']
+                    ))]
+                    for (name, label_values), histogram
+                    in self.histograms.items()
+                ],
+            }
+
+    def path(self):
+        return Path(settings.METRICS_DIR) / f'{os.getpid()}.json'
+
+    def flush(self, force=False):
+        """Сбрасывает метрики в файл процесса, если подошло время."""
+        if not settings.METRICS_DIR:
+            return
+        with self.lock:
+            now = time.monotonic()
+            interval = settings.METRICS_FLUSH_INTERVAL
+            if not force and now - self.flushed_at < interval:
+                return
+            self.flushed_at = now
+        path = self.path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix(f'.{threading.get_ident()}.tmp')
+        temporary.write_text(json.dumps(self.snapshot()), encoding='utf-8')
+        # Замена атомарна: читатель не увидит недописанный файл.
+        os.replace(temporary, path)
+
+
+store = MetricsStore()
+
+
+def collect():
+    """Сумма метрик всех процессов, для текущего — без задержки сброса."""
+    snapshots = [store.snapshot()]
+    if settings.METRICS_DIR:
+        for path in Path(settings.METRICS_DIR).glob('*.json'):
+            if path != store.path():
+                snapshots.append(json.loads(path.read_text(encoding='utf-8')))
+    counters = defaultdict(int)
+    histograms = {}
+    for snapshot in snapshots:
+        for name, label_values, value in snapshot['counters']:
+            counters[name, label_values] += value
+        for name, label_values, histogram in snapshot['histograms']:
+            total = histograms.setdefault((name, label_values), {
+                'buckets': [0] * len(histogram['buckets']),
+                'sum': 0.0, 'count': 0,
+            })
+            for index, count in enumerate(histogram['buckets']):
+                total['buckets'][index] += count
+            total['sum'] += histogram['sum']
+            total['count'] += histogram['count']
+    return counters, histograms
+
+
+def render(counters, histograms):
+    prefix = settings.METRICS_NAMESPACE
+    lines = []
+    for name, (description, bounds) in HISTOGRAMS.items():
+        metric = f'{prefix}_{name}'
+        lines += [f'# HELP {metric} {description}',
+                  f'# TYPE {metric} histogram']
+        for (histogram_name, label_values), histogram in sorted(
+            histograms.items()
+        ):
+            if histogram_name != name:
+                continue
+            for bound, count in zip(bounds, histogram['buckets']):
+                bucket_labels = ','.join(
+                    filter(None, (label_values, labels(le=bound)))
+                )
+                lines.append(f'{metric}_bucket{{{bucket_labels}}} {count}')
+            bucket_labels = ','.join(
+                filter(None, (label_values, labels(le='+Inf')))
+            )
+            lines += [
+                f'{metric}_bucket{{{bucket_labels}}} {histogram["count"]}',
+                f'{metric}_sum{{{label_values}}} {histogram["sum"]}',
+                f'{metric}_count{{{label_values}}} {histogram["count"]}',
+            ]
+    for name, description in COUNTERS.items():
+        metric = f'{prefix}_{name}'
+        lines += [f'# HELP {metric} {description}',
+                  f'# TYPE {metric} counter']
+        for (counter_name, label_values), value in sorted(counters.items()):
+            if counter_name == name:
+                lines.append(f'{metric}{{{label_values}}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics(request):
+    """Метрики всех процессов; доступны только с адресов INTERNAL_IPS."""
+    if request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS:
+        raise Http404
+    return HttpResponse(render(*collect()), content_type=CONTENT_TYPE)
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -22,6 +23,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yanote.middleware.ProfilingMiddleware',
+    'yanote.middleware.MetricsMiddleware',
+    'yanote.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,14 +56,74 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yanote.wsgi.application'
 
 
+# Профиль SQLite для нескольких процессов. WAL позволяет читать во
+# время записи, BEGIN IMMEDIATE берёт блокировку записи в начале
+# транзакции, а не при первой записи, и конфликтующая транзакция ждёт
+# timeout секунд (это busy_timeout) вместо ошибки "database is locked".
+# PRAGMA выполняются для каждого нового соединения, значения можно
+# переопределить переменными окружения.
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv('YANOTE_SQLITE_JOURNAL_MODE', 'wal'),
+    'synchronous': os.getenv('YANOTE_SQLITE_SYNCHRONOUS', 'normal'),
+    'mmap_size': os.getenv('YANOTE_SQLITE_MMAP_SIZE', str(128 * 2 ** 20)),
+    # Отрицательное значение — размер в КиБ.
+    'cache_size': os.getenv('YANOTE_SQLITE_CACHE_SIZE', '-20000'),
+}
+
+SQLITE_OPTIONS = {
+    'init_command': ';'.join(
+        f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()
+    ),
+    'transaction_mode': os.getenv(
+        'YANOTE_SQLITE_TRANSACTION_MODE', 'IMMEDIATE'
+    ),
+    'timeout': float(os.getenv('YANOTE_SQLITE_TIMEOUT', '5')),
+}
+
+CONN_MAX_AGE = int(os.getenv('YANOTE_CONN_MAX_AGE', '60'))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_OPTIONS,
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        # Тестовая база — файл, а не память: так в тестах действует
+        # профиль SQLite, а потоки работают с одной базой через
+        # отдельные соединения.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    }
+}
+
+
+# При запуске нескольких процессов нужен общий бэкенд (Redis, Memcached),
+# иначе закешированные пользователи в процессах разойдутся.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
 
+# Сессии и пользователь сессии: db — как по умолчанию в Django,
+# cache — сессии в кеше с записью в базу, cookies — в подписанной
+# cookie. В режимах cache и cookies пользователь тоже берётся из кеша,
+# и авторизованный запрос обходится без запросов к django_session
+# и auth_user.
+SESSION_MODE = os.getenv('YANOTE_SESSION_MODE', 'db')
+
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cached_db',
+    'cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_MODE]
+
+AUTHENTICATION_BACKENDS = ['notes.backends.CachedModelBackend']
+
+USER_CACHE_TIMEOUT = None if SESSION_MODE == 'db' else 60 * 15
+
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
@@ -87,3 +151,48 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('notes:home')
+
+NOTES_COUNT_ON_PAGE = 100
+
+# Бюджет SQL-запросов по имени маршрута: число запросов или пара
+# (число запросов, время работы БД в секундах). Учитываются и запросы
+# сессии и пользователя. Превышение пишется в лог, а в тестах, где
+# QUERY_BUDGET_RAISE включён, приводит к исключению.
+QUERY_BUDGETS = {
+    'notes:home': 2,
+    'notes:list': 3,
+    'notes:detail': 3,
+    'notes:add': 6,
+    'notes:edit': 7,
+    'notes:delete': 4,
+    'notes:success': 2,
+}
+
+QUERY_BUDGET_RAISE = False
+
+# Профилирование запросов с заголовком PROFILING_HEADER с адресов
+# INTERNAL_IPS, см. yanote.middleware.ProfilingMiddleware.
+# PROFILING_SAMPLE_RATE — доля таких запросов, которые профилируются,
+# PROFILING_MAX_PROFILES — сколько последних профилей хранить.
+PROFILING = os.getenv('YANOTE_PROFILING') == '1'
+
+PROFILING_HEADER = 'X-Profile'
+
+PROFILING_SAMPLE_RATE = float(
+    os.getenv('YANOTE_PROFILING_SAMPLE_RATE', '1')
+)
+
+PROFILING_DIR = BASE_DIR / 'profiles'
+
+PROFILING_MAX_PROFILES = 100
+
+# Метрики для Prometheus на странице /metrics, см. yanote.metrics.
+# Процессы складывают метрики в общий каталог METRICS_DIR, лучше
+# в tmpfs. Без него страница показывает метрики одного процесса.
+METRICS_NAMESPACE = 'yanote'
+
+METRICS_DIR = os.getenv('YANOTE_METRICS_DIR')
+
+METRICS_FLUSH_INTERVAL = 5
+
+INTERNAL_IPS = ['127.0.0.1']